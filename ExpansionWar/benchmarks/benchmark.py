@@ -0,0 +1,238 @@
+"""
+Times the simulation, level generation, serialization, network codecs and rendering on synthetic boards.
+
+Run from the ExpansionWar directory:
+    python -m benchmarks.benchmark --planets 200 --connections 400 --rockets 1000 --output results.json
+    python -m benchmarks.benchmark --baseline results.json --tolerance 0.2
+
+Rendering runs under SDL_VIDEODRIVER=dummy and is skipped when the assets zip is missing. With
+--baseline the run exits with status 1 if any benchmark got slower than the tolerance allows.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+import config
+from data.game_data import GameData
+from data.state_replicator import StateReplicator
+from entities.connection import Connection
+from entities.planet import Planet
+from managers.game_manager import GameManager, GameMode
+from pygbagnet.wire_codec import BinaryCodec, JsonCodec
+from simulation.simulation_engine import SimulationEngine
+
+logger = logging.getLogger(__name__)
+
+COLORS = [config.NO_OWNER_COLOR, config.PLAYER_COLOR, (200, 60, 60), (60, 60, 200), (200, 200, 60)]
+
+
+def build_board(planets: int, connections: int, rockets: int, seed: int) -> GameData:
+    """A board with the given counts; planets may overlap, only the load matters."""
+    rng = random.Random(seed)
+    data = GameData(config.PLAYER_COLOR, None, 2100, 2100, 1)
+    for i in range(planets):
+        data.add_planet(Planet(rng.uniform(0, config.GAME_SCENE_WIDTH - config.PLANET_RADIUS * 2),
+                               rng.uniform(0, config.GAME_SCENE_HEIGHT - config.PLANET_RADIUS * 2),
+                               COLORS[i % len(COLORS)]))
+        data.planets[-1].value = rng.randint(1, 200)
+
+    pairs = set()
+    while len(pairs) < min(connections, planets * (planets - 1)):
+        pair = (rng.randrange(planets), rng.randrange(planets))
+        if pair[0] != pair[1]:
+            pairs.add(pair)
+    for source, target in sorted(pairs):
+        data.add_connection(Connection(data.planets[source], data.planets[target]))
+
+    for _ in range(rockets if data.connections else 0):
+        rocket = rng.choice(data.connections).launch_rocket()
+        rocket.current_time = rng.uniform(0, rocket.target_time)
+    return data
+
+
+def measure(function, repeat: int, number: int = 1, setup = None) -> dict:
+    """Runs function number times per sample and reports per-call milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        for _ in range(number):
+            function(argument) if setup is not None else function()
+        samples.append((time.perf_counter() - started) * 1000 / number)
+    return {'median_ms': statistics.median(samples), 'min_ms': min(samples), 'runs': repeat * number}
+
+
+def simulation_benchmarks(args) -> dict:
+    def engine():
+        return SimulationEngine(build_board(args.planets, args.connections, args.rockets, args.seed), rng=random.Random(args.seed))
+
+    def generate(_):
+        manager = GameManager()
+        manager.data = GameData(config.PLAYER_COLOR, None, 2100, 2100, args.level)
+        manager.generate_planets(seed=args.seed)
+
+    board = build_board(args.planets, args.connections, args.rockets, args.seed)
+    saved = board.to_dict()
+    text = json.dumps(saved)
+    return {
+        'simulation_step': measure(lambda e: [e.fixed_step(config.SIMULATION_STEP_MS) for _ in range(60)], args.repeat, setup=engine)
+            | {'steps_per_run': 60},
+        'generate_planets': measure(generate, args.repeat, setup=lambda: None),
+        'to_dict': measure(board.to_dict, args.repeat),
+        'from_dict': measure(lambda: GameData.from_dict(saved), args.repeat),
+        'json_roundtrip': measure(lambda: GameData.from_dict(json.loads(json.dumps(board.to_dict()))), args.repeat),
+        'json_size_bytes': {'value': len(text)},
+    }
+
+
+def codec_benchmarks(args) -> dict:
+    """Encoded size and encode / decode time of a keyframe, a delta and a card, for every wire codec."""
+    board = build_board(args.planets, args.connections, args.rockets, args.seed)
+    replicator = StateReplicator()
+    keyframe = replicator.keyframe(board)
+    engine = SimulationEngine(board, rng=random.Random(args.seed))
+    for _ in range(config.REPLICATION_INTERVAL_MS // config.SIMULATION_STEP_MS):
+        engine.fixed_step(config.SIMULATION_STEP_MS)
+    messages = {
+        'keyframe': keyframe,
+        'delta': replicator.delta(board),
+        'card': {'action': 'card_dropped', 'planet_index': 12, 'card': 1, 'request': True},
+    }
+
+    results = {}
+    for codec in (JsonCodec(), BinaryCodec()):
+        for kind, message in messages.items():
+            wrapped = {'type': 'message', 'message': message}
+            text = codec.encode(wrapped)
+            name = f"codec_{codec.name}_{kind}"
+            results[f"{name}_encode"] = measure(lambda: codec.encode(wrapped), args.repeat, number=10)
+            results[f"{name}_decode"] = measure(lambda: codec.decode(text), args.repeat, number=10)
+            results[f"{name}_bytes"] = {'value': len(codec.prefix) + 1 + len(text)}
+    return results
+
+
+def render_benchmarks(args) -> dict:
+    if not os.path.exists(args.assets):
+        logger.warning(f"{args.assets} not found, skipping rendering benchmarks")
+        return {}
+
+    from managers.asset_manager import AssetManager
+    from managers.resource_manager import ResourceManager
+    from scenes.game_scene import GameScene
+
+    pygame.init()
+    screen = pygame.display.set_mode((config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
+    config.assets = AssetManager(args.assets)
+    config.resources = ResourceManager(config.assets)
+    background = config.resources.scaled("Background.png", (config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
+
+    manager = GameManager()
+    manager.game_mode = GameMode.SINGLE_PLAYER
+    manager.set_data(build_board(args.planets, args.connections, args.rockets, args.seed))
+    scene = GameScene(manager)
+    config.current_scene = scene
+
+    # Only drawing is timed: the board advances between frames, outside the measurement
+    manager.tick = lambda: None
+    engine = manager.engine
+
+    def advance():
+        engine.fixed_step(config.SIMULATION_STEP_MS)
+
+    def full_frame(_):
+        screen.blit(background, (0, 0))
+        scene.draw(screen)
+
+    def dirty_frame(_):
+        scene.draw_dirty(screen, background)
+
+    full_frame(None)
+    dirty_frame(None)
+    return {
+        'draw_full': measure(full_frame, args.repeat, setup=advance),
+        'draw_static_layer': measure(lambda _: scene.draw(screen, background), args.repeat, setup=advance),
+        'draw_dirty': measure(dirty_frame, args.repeat, setup=advance),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> [str]:
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None or 'median_ms' not in result:
+            continue
+        ratio = result['median_ms'] / max(previous['median_ms'], 1e-9)
+        status = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        print(f"{name:20} {previous['median_ms']:10.3f} ms -> {result['median_ms']:10.3f} ms  x{ratio:.2f}  {status}")
+        if status != "ok":
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark simulation, serialization, network codecs and rendering")
+    parser.add_argument("--planets", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=400)
+    parser.add_argument("--rockets", type=int, default=1000)
+    parser.add_argument("--level", type=int, default=5, help="level passed to generate_planets")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--assets", default="assets.zip")
+    parser.add_argument("--skip-render", action="store_true")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline, 0.2 is 20%%")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    results = simulation_benchmarks(args) | codec_benchmarks(args)
+    if not args.skip_render:
+        results |= render_benchmarks(args)
+
+    report = {
+        'meta': {
+            'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'board': {'planets': args.planets, 'connections': args.connections, 'rockets': args.rockets, 'level': args.level, 'seed': args.seed},
+        },
+        'results': results,
+    }
+
+    for name, result in results.items():
+        if 'median_ms' in result:
+            print(f"{name:20} median {result['median_ms']:10.3f} ms   min {result['min_ms']:10.3f} ms")
+        else:
+            print(f"{name:20} {result['value']:10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('board') != report['meta']['board']:
+            logger.warning("Baseline was measured on a different board, the comparison is only indicative")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Times the receive path of pygbag_net.Node against a local websocket server standing in for the relay.
+
+Run from the ExpansionWar directory:
+    python -m benchmarks.network_benchmark --lines 2000 --line-bytes 200 --keyframes 4 --output results.json
+
+The server sends the small lines and the keyframe sized lines cut into frames of --frame-bytes, the
+way the relay forwards its stream, and the run ends when every line is on the node's rxq.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+import websockets
+
+from pygbagnet.pygbag_net import Node
+
+logger = logging.getLogger(__name__)
+
+
+def build_stream(lines: int, line_bytes: int, keyframes: int, keyframe_bytes: int) -> (bytes, int):
+    """The bytes the server sends and how many lines they hold."""
+    small = b":u_1!u@host PRIVMSG u_2 :j64:" + b"A" * max(0, line_bytes - 32) + b"\r\n"
+    large = b":u_1!u@host PRIVMSG u_2 :j64:" + b"B" * max(0, keyframe_bytes - 32) + b"\r\n"
+    chunks = [small] * lines
+    for i in range(keyframes):
+        chunks.insert((i + 1) * len(chunks) // (keyframes + 1), large)
+    return b"".join(chunks), lines + keyframes
+
+
+async def receive_run(args, stream: bytes, expected: int) -> float:
+    """Seconds from the first frame sent until the node queued the last line."""
+    started = asyncio.Event()
+    go = asyncio.Event()
+
+    async def serve(websocket):
+        started.set()
+        await go.wait()
+        for at in range(0, len(stream), args.frame_bytes):
+            await websocket.send(stream[at:at + args.frame_bytes])
+        await websocket.wait_closed()
+
+    async with websockets.serve(serve, "127.0.0.1", args.port):
+        Node.host = f"://127.0.0.1:{args.port}"
+        node = Node(gid="benchmark")
+        await started.wait()
+        while node.aiosock is None:
+            await asyncio.sleep(0)
+
+        began = time.perf_counter()
+        go.set()
+        while len(node.rxq) < expected:
+            await asyncio.sleep(0)
+        elapsed = time.perf_counter() - began
+        await node.aiosock.socket.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the network receive path against a local server")
+    parser.add_argument("--lines", type=int, default=2000, help="small lines, like deltas and cards")
+    parser.add_argument("--line-bytes", type=int, default=200)
+    parser.add_argument("--keyframes", type=int, default=4, help="large lines, like keyframes")
+    parser.add_argument("--keyframe-bytes", type=int, default=50 * 1024)
+    parser.add_argument("--frame-bytes", type=int, default=16 * 1024, help="websocket frame size the server sends")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    stream, expected = build_stream(args.lines, args.line_bytes, args.keyframes, args.keyframe_bytes)
+    samples = [asyncio.run(receive_run(args, stream, expected)) for _ in range(args.repeat)]
+    median = statistics.median(samples)
+    results = {
+        'receive': {'median_ms': median * 1000, 'min_ms': min(samples) * 1000, 'runs': args.repeat},
+        'receive_mb_per_s': {'value': len(stream) / median / 1e6},
+        'receive_lines_per_s': {'value': expected / median},
+        'stream_bytes': {'value': len(stream)},
+    }
+
+    for name, result in results.items():
+        if 'median_ms' in result:
+            print(f"{name:20} median {result['median_ms']:10.3f} ms   min {result['min_ms']:10.3f} ms")
+        else:
+            print(f"{name:20} {result['value']:14.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,43 @@ NO_OWNER_COLOR = (0x81, 0x83, 0x80)
 SATELLITE_RAY_COLOR = (255, 235, 42)
 
 
+#Simulation
+SIMULATION_STEP_MS = 16
+SIMULATION_PART = 200 # launches, landings or payouts between the points where a step can pause
+ROCKET_SPEED = 0.6 # pixels per millisecond
+SPATIAL_HASH_CELL_SIZE = PLANET_RADIUS * 2
+
+
+#Enemy AI
+AI_LOOKAHEAD_LEVEL = 3 # levels from here on plan moves ahead
+AI_FRAME_BUDGET_MS = 2
+AI_LOOKAHEAD_HORIZON_MS = 12 * 1000
+AI_LOOKAHEAD_STEP_MS = 64
+AI_LOOKAHEAD_STEP_LOAD = 500 # connections and rockets in flight above which rollout steps get shorter
+AI_LOOKAHEAD_CANDIDATES = 6
+AI_ATTACK_COOLDOWN_MS = 3 * 1000
+AI_PLANET_WORTH = 10
+
+
+#Rendering
+DIRTY_RECT_RENDERING = False
+
+
+#Render caches
+ROCKET_HEADING_STEP = 2 # degrees
+ROCKET_SPRITE_CACHE_BYTES = 4 * 1024 * 1024
+SATELLITE_ANGLE_STEP = 2 # degrees
+LABEL_CACHE_BYTES = 2 * 1024 * 1024
+
+
+#Networking
+RELAY_HOST = None # None for the public relay, "://127.0.0.1:8765" for tools.relay_server
+REPLICATION_INTERVAL_MS = 100 # host deltas, in game time
+REPLICATION_KEYFRAME_MS = 60 * 1000
+REPLICATION_ACK_MS = 500
+REPLICATION_LOG_LIMIT = 600 # unacknowledged deltas kept for resending
+
+
 #Upgrade costs
 ROCKET_COST = 5
 SATELLITE_COST = 10
@@ -38,6 +75,7 @@ LOCAL_STORAGE = "saves"
 
 # Assets
 assets = None
+resources = None
 gm = None
 pgnm : PygbagnetManager = None
 FONT_NAME = "Kenney Future Narrow.ttf"
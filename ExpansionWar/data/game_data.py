@@ -1,10 +1,17 @@
 import json
 import logging
+import operator
 
+import config
 from managers.save_manager import SaveManager
 
 from entities.connection import Connection
 from entities.planet import Planet
+from entities.rocket import Rocket
+from simulation.planet_state import PlanetState
+from simulation.rocket_state import RocketState
+from simulation.scheduler import Scheduler
+from simulation.spatial_hash import SpatialHash
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +20,20 @@ class GameData:
         self.p1color : (int, int, int) = p1color
         self.p2color : (int, int, int) = p2color
         self.planets : [Planet] = []
+        self.planet_state : PlanetState = PlanetState()
+        self.rocket_state : RocketState = RocketState(self.planet_state)
         self.connections : [Connection] = []
+        # Next income time by planet index and next launch time by connection, so the engine only visits what is due
+        self.income_timers : Scheduler = Scheduler()
+        self.launch_timers : Scheduler = Scheduler()
+        # Connections due to launch but waiting for their source planet (by index) to afford a rocket
+        self.waiting_launches : {int: [Connection]} = {}
+        # Adjacency index over connections, by planet index: source -> {target: connection}, plus the directed edges
+        self.outgoing : {int: {int: Connection}} = {}
+        self.edges : {(int, int)} = set()
+        # Uniform grids of planet and connection bounding boxes, in board coordinates, for hit-testing and placement
+        self.planet_grid = SpatialHash(config.SPATIAL_HASH_CELL_SIZE)
+        self.connection_grid = SpatialHash(config.SPATIAL_HASH_CELL_SIZE)
         self.year : int = year
         self.year_start : int = year_start
         self.level : int = level
@@ -23,6 +43,159 @@ class GameData:
         self.current_turn_start : int = 0
         self.current_ticks : int = 0
 
+    def add_planet(self, planet: Planet):
+        planet.attach(self.planet_state)
+        self.planets.append(planet)
+        self.planet_grid.insert(planet, planet.x, planet.y, planet.x + planet.radius * 2, planet.y + planet.radius * 2)
+        self.schedule_income(planet)
+
+    def add_connection(self, connection: Connection):
+        connection.rocket_state = self.rocket_state
+        self.connections.append(connection)
+        self.launch_timers.schedule(connection, connection.last_ticks + connection.planet.send_rocket_every + 1)
+
+        source, target = connection.planet.index, connection.other_planet.index
+        self.outgoing.setdefault(source, {})[target] = connection
+        self.edges.add((source, target))
+
+        x1, y1 = connection.planet.center_x, connection.planet.center_y
+        x2, y2 = connection.other_planet.center_x, connection.other_planet.center_y
+        self.connection_grid.insert(connection, min(x1, x2) - connection.line_width, min(y1, y2) - connection.line_width,
+                                    max(x1, x2) + connection.line_width, max(y1, y2) + connection.line_width)
+
+    def remove_connection(self, connection: Connection):
+        self.rocket_state.remove_connection(connection.id)
+        self.connections.remove(connection)
+        self.launch_timers.cancel(connection)
+        waiting = self.waiting_launches.get(connection.planet.index)
+        if waiting is not None and connection in waiting:
+            waiting.remove(connection)
+        self.connection_grid.remove(connection)
+
+        source, target = connection.planet.index, connection.other_planet.index
+        if self.outgoing.get(source, {}).get(target) is not connection:
+            return
+
+        # A duplicate of the same edge, e.g. from a network message, takes over the index entry
+        duplicate = next((c for c in self.connections if c.planet.index == source and c.other_planet.index == target), None)
+        if duplicate is not None:
+            self.outgoing[source][target] = duplicate
+            return
+
+        del self.outgoing[source][target]
+        if not self.outgoing[source]:
+            del self.outgoing[source]
+        self.edges.discard((source, target))
+
+    def schedule_income(self, planet: Planet):
+        """(Re)arms the planet's income timer; needed whenever it may have gone from unowned to owned."""
+        self.income_timers.schedule(planet.index, planet.value_start + planet.add_value_every + 1)
+
+    def wake_launches(self, planet: Planet, time: int):
+        """Re-checks the connections waiting on planet at time; call it whenever the planet's value goes up."""
+        for connection in self.waiting_launches.pop(planet.index, ()):
+            self.launch_timers.schedule(connection, time)
+
+    def is_connected(self, planet: Planet, other_planet: Planet) -> bool:
+        return (planet.index, other_planet.index) in self.edges
+
+    def are_linked(self, planet: Planet, other_planet: Planet) -> bool:
+        """Whether a connection runs between the two planets in either direction."""
+        return (planet.index, other_planet.index) in self.edges or (other_planet.index, planet.index) in self.edges
+
+    def planets_at(self, x: float, y: float) -> [Planet]:
+        """Planets whose bounding box may contain the board point, in board order."""
+        return sorted(self.planet_grid.query_point(x, y), key=lambda planet: planet.index)
+
+    def connections_at(self, x: float, y: float) -> [Connection]:
+        """Connections that may pass within click distance of the board point, in creation order."""
+        return sorted(self.connection_grid.query_point(x, y), key=lambda connection: connection.id)
+
+    def fork(self) -> 'GameData':
+        """
+        Copy of the simulation state that shares nothing with this board, for playing moves ahead.
+        Planets and connections are bare copies that load nothing to draw.
+        """
+        game = GameData(self.p1color, self.p2color, self.year, self.year_start, self.level)
+        game.current_turn_color = self.current_turn_color
+        game.current_turn_start = self.current_turn_start
+        game.current_ticks = self.current_ticks
+
+        game.planet_state = self.planet_state.copy()
+        game.rocket_state = self.rocket_state.copy(game.planet_state)
+        game.planets = [planet.fork(game.planet_state) for planet in self.planets]
+        game.planet_grid = self.planet_grid.copy({planet: game.planets[planet.index] for planet in self.planets})
+        game.income_timers = self.income_timers.copy()
+
+        # The indexes add_connection keeps are copied as they are, rebuilding them costs more than the rest
+        connections = {connection: connection.fork(game.planets[connection.planet.index], game.planets[connection.other_planet.index], game.rocket_state)
+                       for connection in self.connections}
+        game.connections = list(connections.values())
+        game.outgoing = {source: {target: connections[connection] for target, connection in targets.items()}
+                         for source, targets in self.outgoing.items()}
+        game.edges = set(self.edges)
+        game.connection_grid = self.connection_grid.copy(connections)
+        game.launch_timers = self.launch_timers.copy(connections)
+        game.waiting_launches = {index: [connections[connection] for connection in waiting]
+                                 for index, waiting in self.waiting_launches.items()}
+        return game
+
+    def snapshot(self) -> 'GameData':
+        """
+        Copy of only the state the rules change, for restore() to bring a fork of this board back to it.
+        It keeps this board's connections and has no planets of its own, so it is far cheaper than fork()
+        but no board to play on.
+        """
+        game = GameData(self.p1color, self.p2color, self.year, self.year_start, self.level)
+        game.current_turn_color = self.current_turn_color
+        game.current_turn_start = self.current_turn_start
+        game.current_ticks = self.current_ticks
+
+        game.planet_state = self.planet_state.copy()
+        game.rocket_state = self.rocket_state.copy(game.planet_state)
+        game.income_timers = self.income_timers.copy()
+        game.connections = list(self.connections)
+        game.launch_timers = self.launch_timers.copy()
+        game.waiting_launches = {index: list(waiting) for index, waiting in self.waiting_launches.items()}
+        return game
+
+    def restore(self, snapshot: 'GameData'):
+        """
+        Brings this board back to snapshot, taken from it or from the board it was forked from, reusing its
+        planets, connections and arrays. Connections added since a snapshot of this board are dropped;
+        against the other board they are matched by id, dropping those the snapshot lacks and forking those
+        new to it. last_ticks, which the rules only write, is left as it is.
+        """
+        self.current_turn_color = snapshot.current_turn_color
+        self.current_turn_start = snapshot.current_turn_start
+        self.current_ticks = snapshot.current_ticks
+        self.year = snapshot.year
+        self.planet_state.restore(snapshot.planet_state)
+        self.income_timers = snapshot.income_timers.copy()
+        self.rocket_state.restore(snapshot.rocket_state)
+
+        count = len(snapshot.connections)
+        if count <= len(self.connections) and all(map(operator.is_, snapshot.connections, self.connections)):
+            for connection in self.connections[count:]:
+                self.remove_connection(connection)
+            self.launch_timers = snapshot.launch_timers.copy()
+            self.waiting_launches = {index: list(waiting) for index, waiting in snapshot.waiting_launches.items()}
+            return
+
+        kept = {connection.id for connection in snapshot.connections}
+        for connection in [connection for connection in self.connections if connection.id not in kept]:
+            self.remove_connection(connection)
+        forks = {connection.id: connection for connection in self.connections}
+        for connection in snapshot.connections:
+            if connection.id not in forks:
+                forks[connection.id] = connection.fork(self.planets[connection.planet.index], self.planets[connection.other_planet.index], self.rocket_state)
+                self.add_connection(forks[connection.id])
+
+        connections = {connection: forks[connection.id] for connection in snapshot.connections}
+        self.launch_timers = snapshot.launch_timers.copy(connections)
+        self.waiting_launches = {index: [connections[connection] for connection in waiting]
+                                 for index, waiting in snapshot.waiting_launches.items()}
+
     def to_dict(self):
         return {
             'p1color': self.p1color,
@@ -47,8 +220,13 @@ class GameData:
                         )
         game.current_turn_color = tuple(data['current_turn_color'])
         game.current_turn_start = int(data['current_turn_start'])
-        game.planets = [Planet.from_dict(pd) for pd in data['planets']]
-        game.connections = [Connection.from_dict(cd, game.planets) for cd in (data.get('connections') or [])]
+        for pd in data['planets']:
+            game.add_planet(Planet.from_dict(pd))
+        for cd in (data.get('connections') or []):
+            connection = Connection.from_dict(cd, game.planets)
+            game.add_connection(connection)
+            for r_data in (cd.get('rockets') or []):
+                Rocket.from_dict(r_data, connection)
         game.current_ticks = int(data['current_ticks'])
         return game
 
@@ -0,0 +1,289 @@
+from collections import deque
+
+import numpy as np
+
+import config
+from data.game_data import GameData
+from entities.connection import Connection
+from entities.planet import Planet
+
+
+class StateReplicator:
+    """
+    Keeps a client's GameData in step with the host's through versioned messages.
+
+    The host sends a keyframe with the whole state, then deltas with only what changed since the
+    message before: planet fields, connections by the host's connection id, rockets by their launch
+    sequence, and the clocks. Each delta names the version it applies on top of, so a client that
+    misses one asks again instead of drifting. Deltas stay in the host's log until the client
+    acknowledges them, so they can be sent again.
+
+    Owner ids travel as they are: a keyframe gives the client the host's colour table and deltas
+    append the colours that are new.
+    """
+
+    PLANET_FIELDS = ('owner', 'value', 'value_start', 'add_value_every', 'send_rocket_every', 'rocket_upgrade', 'satellite_upgrade')
+
+    def __init__(self):
+        self.version = 0
+
+        # Host: what the client was last sent, to diff against, and the sent deltas it has not acknowledged
+        self.sent_fields : {str: np.ndarray} = {}
+        self.sent_connections : {int} = set()
+        self.sent_rockets : {int} = set()
+        self.sent_colors = 0
+        self.log : deque = deque()
+        self.acknowledged = 0
+
+        # Client: host connection ids to local connections, host rocket sequences to local rocket slots
+        self.connections : {int: Connection} = {}
+        self.rockets : {int: int} = {}
+
+    # Host
+
+    def keyframe(self, data: GameData) -> dict:
+        state = data.planet_state
+        self.version += 1
+        self.log.clear()
+        self.remember(data)
+        return {
+            'action': 'keyframe',
+            'version': self.version,
+            'p1color': data.p1color,
+            'p2color': data.p2color,
+            'year_start': data.year_start,
+            'level': data.level,
+            'clock': StateReplicator.clock(data),
+            'colors': list(state.colors),
+            'planets': [planet.to_dict() for planet in data.planets],
+            'fields': {name: getattr(state, name)[:state.count].tolist() for name in StateReplicator.PLANET_FIELDS},
+            'connections': [StateReplicator.connection_record(connection) for connection in data.connections],
+            'rockets': StateReplicator.rocket_records(data, data.rocket_state.in_flight()),
+        }
+
+    def delta(self, data: GameData) -> dict:
+        """Changes since the last message, or None when nothing but the clocks moved."""
+        state = data.planet_state
+        if state.count != len(self.sent_fields.get('owner', ())):
+            return self.keyframe(data)
+
+        planets = {}
+        for name in StateReplicator.PLANET_FIELDS:
+            current = getattr(state, name)[:state.count]
+            changed = np.flatnonzero(current != self.sent_fields[name])
+            if len(changed):
+                planets[name] = [changed.tolist(), current[changed].tolist()]
+
+        connections = {connection.id for connection in data.connections}
+        added_connections = [StateReplicator.connection_record(connection) for connection in data.connections
+                             if connection.id not in self.sent_connections]
+        removed_connections = sorted(self.sent_connections - connections)
+
+        rockets = data.rocket_state
+        slots = rockets.in_flight()
+        sequences = rockets.sequence[slots].tolist()
+        added_rockets = StateReplicator.rocket_records(data, [slot for slot, sequence in zip(slots.tolist(), sequences)
+                                                              if sequence not in self.sent_rockets])
+        removed_rockets = sorted(self.sent_rockets.difference(sequences))
+
+        colors = state.colors[self.sent_colors:]
+        if not (planets or added_connections or removed_connections or added_rockets or removed_rockets or colors):
+            return None
+
+        self.version += 1
+        message = {
+            'action': 'delta',
+            'version': self.version,
+            'base': self.version - 1,
+            'clock': StateReplicator.clock(data),
+            'colors': colors,
+            'planets': planets,
+            'connections': [added_connections, removed_connections],
+            'rockets': [added_rockets, removed_rockets],
+        }
+        self.log.append(message)
+        if len(self.log) > config.REPLICATION_LOG_LIMIT:
+            self.log.popleft()
+        self.remember(data)
+        return message
+
+    def acknowledge(self, version: int):
+        self.acknowledged = max(self.acknowledged, version)
+        while self.log and self.log[0]['version'] <= self.acknowledged:
+            self.log.popleft()
+
+    def missed(self, version: int) -> [dict]:
+        """The deltas a client at version is missing, or None if they left the log and it needs a keyframe."""
+        if version == self.version:
+            return []
+        missed = [message for message in self.log if message['version'] > version]
+        if not missed or missed[0]['base'] != version:
+            return None
+        return missed
+
+    @staticmethod
+    def merge(messages: [dict]) -> dict:
+        """
+        One delta doing what the consecutive deltas do: the last value of every planet field, and only
+        the connections and rockets that outlived them or were there before them.
+        """
+        planets = {}
+        connections, removed_connections = {}, []
+        rockets, removed_rockets = {}, []
+        colors = []
+        for message in messages:
+            colors += message['colors']
+            for name, (indices, values) in message['planets'].items():
+                planets.setdefault(name, {}).update(zip(indices, values))
+            for added, removed, records, gone in ((*message['connections'], connections, removed_connections),
+                                                  (*message['rockets'], rockets, removed_rockets)):
+                for key in removed:
+                    if records.pop(key, None) is None:
+                        gone.append(key)
+                for record in added:
+                    records[record[0]] = record
+
+        return {
+            'action': 'delta',
+            'version': messages[-1]['version'],
+            'base': messages[0]['base'],
+            'clock': messages[-1]['clock'],
+            'colors': colors,
+            'planets': {name: [list(changes), list(changes.values())] for name, changes in planets.items()},
+            'connections': [list(connections.values()), removed_connections],
+            'rockets': [list(rockets.values()), removed_rockets],
+        }
+
+    def remember(self, data: GameData):
+        state = data.planet_state
+        self.sent_fields = {name: getattr(state, name)[:state.count].copy() for name in StateReplicator.PLANET_FIELDS}
+        self.sent_connections = {connection.id for connection in data.connections}
+        rockets = data.rocket_state
+        self.sent_rockets = set(rockets.sequence[rockets.in_flight()].tolist())
+        self.sent_colors = len(state.colors)
+
+    @staticmethod
+    def clock(data: GameData) -> dict:
+        return {
+            'ticks': data.current_ticks,
+            'year': data.year,
+            'turn_color': data.current_turn_color,
+            'turn_start': data.current_turn_start,
+            'rockets_now': data.rocket_state.now,
+        }
+
+    @staticmethod
+    def connection_record(connection: Connection) -> list:
+        return [connection.id, connection.planet.index, connection.other_planet.index, connection.last_ticks]
+
+    @staticmethod
+    def rocket_records(data: GameData, slots) -> [list]:
+        rockets = data.rocket_state
+        return [[rockets.sequence[slot].item(), rockets.connection[slot].item(), rockets.start[slot].item(),
+                 rockets.payload[slot].item()] for slot in slots]
+
+    # Client
+
+    def apply_keyframe(self, message: dict, data: GameData = None) -> GameData:
+        """
+        Brings the client to the keyframe and returns its board: data itself when it holds the same
+        planets and colours, otherwise a new GameData.
+        """
+        colors = [tuple(color) for color in message['colors']]
+        if (data is None or len(data.planets) != len(message['planets'])
+                or data.planet_state.colors != colors[:len(data.planet_state.colors)]):
+            data = GameData(tuple(message['p1color']),
+                            tuple(message['p2color']) if message['p2color'] is not None else None,
+                            message['clock']['year'], message['year_start'], message['level'])
+            for color in colors:
+                data.planet_state.color_id(color)
+            for planet in message['planets']:
+                data.add_planet(Planet.from_dict(planet))
+            self.connections = {}
+            self.rockets = {}
+
+        self.apply_colors(data, colors)
+        self.apply_clock(data, message['clock'])
+        every_planet = list(range(len(data.planets)))
+        self.apply_planets(data, {name: [every_planet, values] for name, values in message['fields'].items()})
+
+        connections = {record[0] for record in message['connections']}
+        self.apply_rockets_removed(data, list(self.rockets))
+        self.apply_connections(data, [record for record in message['connections'] if record[0] not in self.connections],
+                               [connection_id for connection_id in self.connections if connection_id not in connections])
+        self.apply_rockets_added(data, message['rockets'])
+
+        self.version = message['version']
+        return data
+
+    def apply_delta(self, data: GameData, message: dict) -> bool:
+        """Applies the delta; False if it does not follow the client's version and a keyframe is needed."""
+        if message['version'] <= self.version:
+            return True
+        if message['base'] != self.version:
+            return False
+
+        self.apply_colors(data, [tuple(color) for color in message['colors']])
+        self.apply_clock(data, message['clock'])
+        self.apply_planets(data, message['planets'])
+        # Rockets go before their connections, whose removal would free their slots for reuse
+        added_rockets, removed_rockets = message['rockets']
+        self.apply_rockets_removed(data, removed_rockets)
+        self.apply_connections(data, *message['connections'])
+        self.apply_rockets_added(data, added_rockets)
+
+        self.version = message['version']
+        return True
+
+    @staticmethod
+    def apply_colors(data: GameData, colors: [tuple]):
+        for color in colors:
+            data.planet_state.color_id(color)
+
+    @staticmethod
+    def apply_clock(data: GameData, clock: dict):
+        data.current_ticks = clock['ticks']
+        data.year = clock['year']
+        data.current_turn_color = tuple(clock['turn_color'])
+        data.current_turn_start = clock['turn_start']
+        data.rocket_state.now = clock['rockets_now']
+
+    @staticmethod
+    def apply_planets(data: GameData, planets: dict):
+        state = data.planet_state
+        for name, (indices, values) in planets.items():
+            if name == 'owner':
+                # Through the planet, so it is drawn again in its new colour
+                for index, owner_id in zip(indices, values):
+                    if state.owner[index] != owner_id:
+                        data.planets[index].set_color(state.colors[owner_id])
+            else:
+                getattr(state, name)[indices] = values
+
+    def apply_connections(self, data: GameData, added: [list], removed: [int]):
+        for connection_id in removed:
+            connection = self.connections.pop(connection_id, None)
+            if connection is not None:
+                data.remove_connection(connection)
+        for connection_id, source, target, last_ticks in added:
+            connection = Connection(data.planets[source], data.planets[target])
+            connection.last_ticks = last_ticks
+            data.add_connection(connection)
+            self.connections[connection_id] = connection
+
+    def apply_rockets_removed(self, data: GameData, sequences: [int]):
+        slots = [self.rockets.pop(sequence) for sequence in sequences if sequence in self.rockets]
+        if slots:
+            data.rocket_state.release(np.array(slots, dtype=np.int64))
+
+    def apply_rockets_added(self, data: GameData, records: [list]):
+        rockets = data.rocket_state
+        for sequence, connection_id, start, payload in records:
+            connection = self.connections.get(connection_id)
+            if connection is None:
+                continue
+            slot = rockets.launch([connection])[0].item()
+            rockets.sequence[slot] = sequence
+            rockets.payload[slot] = payload
+            rockets.set_elapsed(slot, rockets.now - start)
+            self.rockets[sequence] = slot
@@ -32,7 +32,7 @@ class Card:
         texture_rect.center = (width // 2, height // 2 - 10)
         self.card_surface.blit(texture, texture_rect)
 
-        font_points = pygame.font.Font(config.assets[config.FONT_NAME], 35)
+        font_points = config.resources.font(config.FONT_NAME, 35)
 
         points_text = font_points.render(str(points), True, BLACK)
         text_rect = points_text.get_rect(center=(width // 2, height - 30))
@@ -1,36 +1,65 @@
+import itertools
 import math
 import pygame
 
 from entities.rocket import Rocket
+from simulation.rocket_state import RocketState
 
 
 class Connection:
-    def __init__(self, planet, other_planet):
+    Ids = itertools.count()
+
+    def __init__(self, planet, other_planet, warm: bool = True):
+        self.id = next(Connection.Ids)
         self.planet = planet
         self.other_planet = other_planet
 
         self.last_ticks = 0
         self.line_width = 10
 
-        self.rockets = []
-
-    def rocket_finished(self, rocket):
-        self.rockets.remove(rocket)
-
-    def draw(self, base_x, base_y, surface, current_ticks):
-
-        if self.planet.value > self.planet.rocket_upgrade and current_ticks - self.last_ticks > self.planet.send_rocket_every:
-            self.last_ticks = current_ticks
-            self.rockets.append(Rocket(self, self.planet, self.other_planet))
-            self.planet.value -= self.planet.rocket_upgrade
-
+        # Set by GameData.add_connection
+        self.rocket_state : RocketState = None
+
+        # Rockets launched later only look their sprites up; boards that are never drawn skip it
+        if warm:
+            Rocket.warm(Rocket.heading(planet, other_planet))
+
+    def fork(self, planet, other_planet, rocket_state: RocketState) -> 'Connection':
+        """
+        Bare copy between planets of another board, for simulation-only boards; it warms no sprites. It keeps
+        the id, so rockets and restore() find it by the id of the original.
+        """
+        connection = Connection.__new__(Connection)
+        connection.id = self.id
+        connection.planet = planet
+        connection.other_planet = other_planet
+        connection.last_ticks = self.last_ticks
+        connection.line_width = self.line_width
+        connection.rocket_state = rocket_state
+        return connection
+
+    @property
+    def rockets(self):
+        return [Rocket(self.rocket_state, slot) for slot in self.rocket_state.of_connection(self.id)]
+
+    def launch_rocket(self):
+        return Rocket(self.rocket_state, self.rocket_state.launch([self])[0])
+
+    def draw(self, base_x, base_y, surface):
         pygame.draw.line(surface, self.planet.color,
                          (base_x + self.planet.center_x, base_y + self.planet.center_y),
                          (base_x + self.other_planet.center_x, base_y + self.other_planet.center_y),
                          self.line_width + 5 * self.planet.rocket_upgrade)
 
-        for rocket in self.rockets:
-            rocket.draw(base_x, base_y, surface)
+    def bounds(self, base_x, base_y) -> pygame.Rect:
+        """Screen area draw() may touch, for dirty-rect rendering."""
+        x1, y1 = (base_x + self.planet.center_x, base_y + self.planet.center_y)
+        x2, y2 = (base_x + self.other_planet.center_x, base_y + self.other_planet.center_y)
+        width = self.line_width + 5 * self.planet.rocket_upgrade
+        return pygame.Rect(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1).inflate(width + 2, width + 2)
+
+    def render_signature(self):
+        return self.planet.color, self.planet.rocket_upgrade
 
     def is_clicked(self, base_x, base_y, point):
         px, py = point
@@ -68,5 +97,4 @@ class Connection:
     def from_dict(cls, data, planets):
         conn = cls(planets[int(data['planet_index'])], planets[int(data['other_planet_index'])])
         conn.last_ticks = int(data['last_ticks'])
-        conn.rockets = [Rocket.from_dict(r_data, conn) for r_data in (data.get('rockets') or [])]
         return conn
\ No newline at end of file
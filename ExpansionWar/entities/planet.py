@@ -1,23 +1,33 @@
 import random
 import pygame
 import config
-import math
 import logging
 
+from managers.label_cache import LabelCache
+from managers.satellite_atlas import SatelliteAtlas
+from simulation.planet_state import PlanetState, StateField
+
 logger = logging.getLogger(__name__)
 
 class Planet:
     Textures = None
+    # Value labels shared by every planet, so a label is rendered again only when its text changes
+    Labels = LabelCache("planet labels", config.LABEL_CACHE_BYTES)
+
+    # Simulation state lives in a PlanetState row, shared with the rest of the board once attached to GameData
+    x = StateField(float)
+    y = StateField(float)
+    radius = StateField(float)
+    value = StateField(int)
+    value_start = StateField(int)
+    add_value_every = StateField(int)
+    send_rocket_every = StateField(int)
+    rocket_upgrade = StateField(int)
+    satellite_upgrade = StateField(int)
 
     def __init__(self, x, y, color, radius = config.PLANET_RADIUS, show_value = True, base_texture = None, noise_texture = None, light_texture = None):
-
-        if Planet.Textures is None:
-            Planet.Textures = {}
-            for file in config.assets.find("PlanetParts"):
-                if not file.endswith(".png"):
-                    continue
-                filename = file.split(".")[0]
-                Planet.Textures[filename] = pygame.image.load(config.assets[f"PlanetParts/{file}"])
+        self.state = PlanetState(1)
+        self.index = self.state.add()
 
         self.x = x
         self.y = y
@@ -26,8 +36,6 @@ class Planet:
         self.radius = radius
         self.selected = False
         self.apply_black_surface = False
-        self.center_x = self.x + self.radius
-        self.center_y = self.y + self.radius
 
         self.target_value = None
 
@@ -39,38 +47,98 @@ class Planet:
         self.send_rocket_every = 1 * 1000
         self.rocket_upgrade = 1
 
-        if base_texture is None:
-            self.base_texture_name = random.choice([key for key in Planet.Textures if "sphere" in key])
-        else:
-            self.base_texture_name = base_texture
-        self.base_texture = Planet.Textures[self.base_texture_name]
+        # Texture names are picked here so they end up in saves; headless games (no assets) pick them on first draw
+        self.base_texture_name = base_texture
+        self.noise_texture_name = noise_texture
+        self.light_texture_name = light_texture
+        if config.assets is not None:
+            self.choose_texture_names()
 
-        if noise_texture is None:
-            self.noise_texture_name = random.choice([key for key in Planet.Textures if "noise" in key])
-        else:
-            self.noise_texture_name = noise_texture
-        self.noise_texture = Planet.Textures[self.noise_texture_name]
+        # Render resources are created on first draw, so the simulation can run without a display
+        self.base_texture = None
+        self.surface = None
 
-        if light_texture is None:
-            self.light_texture_name = random.choice([key for key in Planet.Textures if "light" in key])
-        else:
-            self.light_texture_name = light_texture
-        self.light_texture = Planet.Textures[self.light_texture_name]
+        # Satellite attributes:
+        self.satellite_upgrade = 0
+        self.satellite_orbit_speed = 0.01
 
-        self.base_texture = pygame.transform.scale(self.base_texture, (radius * 2, radius * 2))
-        self.noise_texture = pygame.transform.scale(self.noise_texture, (radius * 2, radius * 2))
-        self.light_texture = pygame.transform.scale(self.light_texture, (radius * 2, radius * 2))
+    def attach(self, state: PlanetState):
+        self.index = state.adopt(self.state, self.index)
+        self.state = state
+
+    def fork(self, state: PlanetState) -> 'Planet':
+        """Bare copy viewing the same row of another state, for simulation-only boards; it loads nothing to draw."""
+        planet = Planet.__new__(Planet)
+        planet.state = state
+        planet.index = self.index
+        planet.selected = False
+        planet.apply_black_surface = False
+        planet.target_value = None
+        planet.show_value = self.show_value
+        planet.base_texture_name = self.base_texture_name
+        planet.noise_texture_name = self.noise_texture_name
+        planet.light_texture_name = self.light_texture_name
+        planet.base_texture = None
+        planet.surface = None
+        planet.satellite_orbit_speed = self.satellite_orbit_speed
+        return planet
+
+    @property
+    def color(self):
+        return self.state.colors[self.state.owner[self.index]]
+
+    @color.setter
+    def color(self, new_color):
+        self.state.set_owner(self.index, self.state.color_id(new_color))
+
+    @property
+    def center_x(self):
+        return self.x + self.radius
+
+    @center_x.setter
+    def center_x(self, value):
+        self.x = value - self.radius
+
+    @property
+    def center_y(self):
+        return self.y + self.radius
+
+    @center_y.setter
+    def center_y(self, value):
+        self.y = value - self.radius
+
+    @staticmethod
+    def load_textures():
+        if Planet.Textures is None:
+            Planet.Textures = {}
+            for file in config.assets.find("PlanetParts"):
+                if not file.endswith(".png"):
+                    continue
+                filename = file.split(".")[0]
+                Planet.Textures[filename] = f"PlanetParts/{file}"
+        return Planet.Textures
 
-        self.font = pygame.font.Font(config.assets[config.FONT_NAME], 35)
+    def choose_texture_names(self):
+        textures = Planet.load_textures()
+        if self.base_texture_name is None:
+            self.base_texture_name = random.choice([key for key in textures if "sphere" in key])
+        if self.noise_texture_name is None:
+            self.noise_texture_name = random.choice([key for key in textures if "noise" in key])
+        if self.light_texture_name is None:
+            self.light_texture_name = random.choice([key for key in textures if "light" in key])
 
-        self.create_planet_surface()
+    def create_render_resources(self):
+        self.choose_texture_names()
+        textures = Planet.load_textures()
 
-        # Satellite attributes:
-        self.satellite_upgrade = 0
-        scaled_satellite = pygame.image.load(config.assets['satellite.png'])
-        scaled_satellite = pygame.transform.scale(scaled_satellite, (scaled_satellite.get_width()/6, scaled_satellite.get_height()/6))
-        self.satellite_base_texture = pygame.transform.rotate(scaled_satellite, -90)
-        self.satellite_orbit_speed = 0.01
+        # Scaled textures are shared through config.resources; only the tinted surfaces are per planet
+        self.base_texture = config.resources.scaled(textures[self.base_texture_name], (self.radius * 2, self.radius * 2))
+        self.noise_texture = config.resources.scaled(textures[self.noise_texture_name], (self.radius * 2, self.radius * 2))
+        self.light_texture = config.resources.scaled(textures[self.light_texture_name], (self.radius * 2, self.radius * 2))
+
+        self.satellite_atlas = SatelliteAtlas.get('satellite.png', self.radius)
+
+        self.create_planet_surface()
 
     def create_planet_surface(self):
         planet_surface = pygame.Surface((self.radius * 2, self.radius * 2), pygame.SRCALPHA)
@@ -95,33 +163,28 @@ class Planet:
         self.surface = planet_surface
 
     def draw(self, screen, base_x, base_y, current_ticks):
-        if self.color != config.NO_OWNER_COLOR:
-            if current_ticks - self.value_start > self.add_value_every:
-                self.value_start = current_ticks
-                self.value += 1 + self.satellite_upgrade
+        if self.base_texture is None:
+            self.create_render_resources()
+        elif self.surface is None:
+            self.create_planet_surface()
 
         # Render orbiting satellites if upgrade is applied
         if self.satellite_upgrade > 0:
             planet_center_x = base_x + self.center_x
             planet_center_y = base_y + self.center_y
-            orbit_radius = self.radius + (self.satellite_base_texture.get_width() // 2) + 5
             orbit_offset = (current_ticks * self.satellite_orbit_speed) % 360
 
             for i in range(self.satellite_upgrade):
                 base_angle_degrees = (360 / self.satellite_upgrade) * i
-                orbit_angle_degrees = base_angle_degrees + orbit_offset
-                orbit_angle_radians = math.radians(orbit_angle_degrees)
-                sat_x = planet_center_x + orbit_radius * math.cos(orbit_angle_radians)
-                sat_y = planet_center_y + orbit_radius * math.sin(orbit_angle_radians)
-                facing_angle = math.degrees(math.atan2(sat_y - planet_center_y, planet_center_x - sat_x))
-                rotated_satellite = pygame.transform.rotate(self.satellite_base_texture, facing_angle)
-                rotated_rect = rotated_satellite.get_rect(center=(sat_x, sat_y))
+                (rotated_satellite, half_width, half_height), (offset_x, offset_y) = self.satellite_atlas.lookup(base_angle_degrees + orbit_offset)
+                sat_x = planet_center_x + offset_x
+                sat_y = planet_center_y + offset_y
 
                 if current_ticks - self.value_start < 100:
                     pygame.draw.line(screen, config.SATELLITE_RAY_COLOR, (sat_x, sat_y),
                                      (planet_center_x, planet_center_y), 5)
 
-                screen.blit(rotated_satellite, rotated_rect)
+                screen.blit(rotated_satellite, (sat_x - half_width, sat_y - half_height))
 
         screen.blit(self.surface, (base_x + self.x, base_y + self.y))
         if self.selected:
@@ -131,20 +194,45 @@ class Planet:
             screen.blit(self.black_surface, (base_x + self.x, base_y + self.y))
 
         if self.show_value:
-            if self.target_value:
-                text = self.font.render(f"{self.value}/{self.target_value}", True, (255, 255, 255))
-            else:
-                text = self.font.render(f"{self.value}", True, (255, 255, 255))
+            text = Planet.Labels.render(config.FONT_NAME, 35, self.label(), (255, 255, 255))
             text_rect = text.get_rect(center=(base_x + self.center_x, base_y + self.center_y))
             screen.blit(text, text_rect)
 
+    def label(self):
+        if self.target_value:
+            return f"{self.value}/{self.target_value}"
+        return f"{self.value}"
+
+    def bounds(self, base_x, base_y) -> pygame.Rect:
+        """Screen area draw() may touch, for dirty-rect rendering."""
+        if self.base_texture is None:
+            self.create_render_resources()
+
+        rect = pygame.Rect(base_x + self.x, base_y + self.y, self.radius * 2, self.radius * 2)
+        if self.satellite_upgrade > 0:
+            reach = self.satellite_atlas.orbit_radius + self.satellite_atlas.reach
+            rect.union_ip(pygame.Rect(0, 0, reach * 2, reach * 2).move(base_x + self.center_x - reach, base_y + self.center_y - reach))
+        if self.show_value:
+            text = Planet.Labels.render(config.FONT_NAME, 35, self.label(), (255, 255, 255))
+            rect.union_ip(text.get_rect(center=(base_x + self.center_x, base_y + self.center_y)))
+        return rect.inflate(2, 2)
+
+    def render_signature(self, current_ticks):
+        """Everything draw() depends on besides bounds; a change means the planet has to be redrawn."""
+        signature = (self.color, self.label() if self.show_value else None, self.selected, self.apply_black_surface, self.satellite_upgrade)
+        if self.satellite_upgrade > 0:
+            orbit_offset = (current_ticks * self.satellite_orbit_speed) % 360
+            signature += tuple(self.satellite_atlas.index((360 / self.satellite_upgrade) * i + orbit_offset) for i in range(self.satellite_upgrade))
+            signature += (current_ticks - self.value_start < 100,)
+        return signature
+
     def is_clicked(self, base_x, base_y, pos):
         distance = ((pos[0] - (base_x + self.center_x)) ** 2 + (pos[1] - (base_y + self.center_y)) ** 2) ** 0.5
         return distance <= self.radius
 
     def set_color(self, new_color):
         self.color = new_color
-        self.create_planet_surface()
+        self.surface = None
 
     def to_dict(self):
         return {
@@ -182,5 +270,4 @@ class Planet:
         planet.value = int(data['value'])
         planet.rocket_upgrade = int(data['rocket_upgrade'])
         planet.satellite_upgrade = int(data['satellite_upgrade'])
-        planet.create_planet_surface()
         return planet
\ No newline at end of file
@@ -3,65 +3,91 @@ import pygame
 import logging
 import config
 
+from managers.sprite_cache import SpriteCache
+from simulation.rocket_state import RocketState
+
 logger = logging.getLogger(__name__)
 
 class Rocket:
     Textures = None
-
-    def __init__(self, parent, planet, other_planet):
-
+    # Scaled and rotated rocket sprites keyed by (tier, heading), shared by every rocket
+    Sprites = SpriteCache("rockets", config.ROCKET_SPRITE_CACHE_BYTES)
+    # Rockets used to move once per drawn frame, at 60 fps
+    LEGACY_FRAME_MS = 1000 / 60
+
+    # A rocket is a view of one RocketState slot
+    def __init__(self, state: RocketState, slot: int):
+        self.state = state
+        self.slot = slot
+
+    @property
+    def value(self):
+        return int(self.state.payload[self.slot])
+
+    @property
+    def current_time(self):
+        return float(self.state.elapsed(self.slot))
+
+    @current_time.setter
+    def current_time(self, value):
+        self.state.set_elapsed(self.slot, value)
+
+    @property
+    def target_time(self):
+        return float(self.state.duration[self.slot])
+
+    @staticmethod
+    def load_textures():
         if Rocket.Textures is None:
             Rocket.Textures = {}
             for file in config.assets.find("Rockets"):
                 if not file.endswith(".png"):
                     continue
                 filename = file.split(".")[0]
-                Rocket.Textures[filename] = pygame.image.load(config.assets[f"Rockets/{file}"])
-
-        assert(planet.rocket_upgrade <= 4)
-        self.value = planet.rocket_upgrade
-
-        self.rocket_texture = Rocket.Textures[f"spaceRockets_00{self.value}"]
-        self.rocket_texture = pygame.transform.scale(self.rocket_texture, (self.rocket_texture.get_width()/10, self.rocket_texture.get_height()/10))
-        self.rocket_texture = pygame.transform.rotate(self.rocket_texture, -math.degrees(math.atan2(other_planet.center_y - planet.center_y, other_planet.center_x - planet.center_x)) - 90)
-
-        self.parent = parent
-        self.planet = planet
-        self.other_planet = other_planet
-
-        self.current_time = 0
-        self.target_time = ((planet.center_x - other_planet.center_x)**2 + (planet.center_y - other_planet.center_y)**2)**0.5/5/2
-
-        self.x = planet.center_x
-        self.y = planet.center_y
-
-    def draw(self, base_x, base_y, screen):
-        self.current_time +=1
-
-        if self.current_time >= self.target_time:
-            if self.planet.color == self.other_planet.color:
-                self.other_planet.value += self.value
-            elif self.planet.color != self.planet:
-                self.other_planet.value -= self.value
-                if self.other_planet.value <= 0:
-                    self.other_planet.set_color(self.planet.color)
-                    self.other_planet.value = self.value
-
-            self.parent.rocket_finished(self)
-
-        self.x = config.lerp(0, self.target_time, self.planet.center_x, self.other_planet.center_x, self.current_time)
-        self.y = config.lerp(0, self.target_time, self.planet.center_y, self.other_planet.center_y, self.current_time)
-
-        rotated_rect = self.rocket_texture.get_rect(center=(base_x + self.x, base_y + self.y))
-        screen.blit(self.rocket_texture, rotated_rect)
+                Rocket.Textures[filename] = config.resources.scaled_by(f"Rockets/{file}", 10)
+        return Rocket.Textures
+
+    @staticmethod
+    def heading(planet, other_planet):
+        return -math.degrees(math.atan2(other_planet.center_y - planet.center_y, other_planet.center_x - planet.center_x)) - 90
+
+    @staticmethod
+    def sprite(value, heading):
+        heading = round(heading / config.ROCKET_HEADING_STEP) * config.ROCKET_HEADING_STEP % 360
+        return Rocket.Sprites.get((value, heading), lambda: pygame.transform.rotate(Rocket.load_textures()[f"spaceRockets_00{value}"], heading))
+
+    @staticmethod
+    def warm(heading):
+        if config.assets is None:
+            return
+        for value in range(1, 5):
+            Rocket.sprite(value, heading)
+
+    @staticmethod
+    def sprites_in_flight(state: RocketState, base_x, base_y):
+        """Yields (sequence, sprite, rect) for every rocket in flight, in launch order."""
+        slots = state.in_flight()
+        xs, ys = state.positions(slots)
+        for sequence, value, heading, x, y in zip(state.sequence[slots].tolist(), state.payload[slots].tolist(), state.heading[slots].tolist(), xs.tolist(), ys.tolist()):
+            rocket_texture = Rocket.sprite(value, heading)
+            yield sequence, rocket_texture, rocket_texture.get_rect(center=(base_x + x, base_y + y))
+
+    @staticmethod
+    def draw_all(state: RocketState, base_x, base_y, screen):
+        for _, rocket_texture, rotated_rect in Rocket.sprites_in_flight(state, base_x, base_y):
+            screen.blit(rocket_texture, rotated_rect)
 
     def to_dict(self):
         return {
-            'current_time': self.current_time,
+            'current_time_ms': self.current_time,
         }
 
     @classmethod
     def from_dict(cls, data, connection):
-        rocket = cls(connection, connection.planet, connection.other_planet)
-        rocket.current_time = int(data['current_time'])
-        return rocket
\ No newline at end of file
+        rocket = connection.launch_rocket()
+        if 'current_time_ms' in data:
+            rocket.current_time = float(data['current_time_ms'])
+        else:
+            # Older saves counted the flight in frames
+            rocket.current_time = int(data['current_time']) * Rocket.LEGACY_FRAME_MS
+        return rocket
@@ -5,8 +5,10 @@ import pygame
 
 import config
 from managers.asset_manager import AssetManager
+from managers.frame_profiler import FrameProfiler
 from managers.game_manager import GameManager
 from managers.pygbagnet_manager import PygbagnetManager
+from managers.resource_manager import ResourceManager
 from managers.save_manager import SaveManager
 from pygbagnet import pygbag_net
 from scenes.menu_scene import MenuScene
@@ -24,18 +26,22 @@ clock = pygame.time.Clock()
 
 async def main():
 
+    if config.RELAY_HOST is not None:
+        pygbag_net.Node.host = config.RELAY_HOST
     config.pgnm = PygbagnetManager(pygbag_net.Node(gid="PlanetConqueror"))
 
-    background = pygame.image.load(config.assets["Background.png"])
-    background = pygame.transform.scale(background, [config.SCREEN_WIDTH, config.SCREEN_HEIGHT])
+    background = config.resources.scaled("Background.png", (config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
 
     config.current_scene = MenuScene()
 
+    profiler = FrameProfiler.Instance
+
     running = True
+    dirty_frame = False
     while running:
-        screen.blit(background, (0, 0), (0, 0, config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
-
+        profiler.begin_frame()
         await config.pgnm.tick()
+        profiler.mark("network")
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -56,12 +62,36 @@ async def main():
                     config.ENABLE_PYGAME_LOG = not config.ENABLE_PYGAME_LOG
                 if hasattr(config.current_scene, "handle_keydown"):
                     config.current_scene.handle_keydown(event)
-
-        config.current_scene.draw(screen)
-        if config.ENABLE_PYGAME_LOG:
-            PygameLogManager.Instance.draw(screen)
-
-        pygame.display.flip()
+        profiler.mark("events")
+
+        if config.DIRTY_RECT_RENDERING and not config.ENABLE_PYGAME_LOG and hasattr(config.current_scene, "draw_dirty"):
+            # After a full frame the screen holds things the scene did not draw, so it starts over
+            rects = config.current_scene.draw_dirty(screen, background, full = not dirty_frame)
+            profiler.mark("scene")
+            pygame.display.update(rects)
+            profiler.mark("flip")
+            dirty_frame = True
+        else:
+            if hasattr(config.current_scene, "static_layer"):
+                config.current_scene.draw(screen, background)
+            else:
+                screen.blit(background, (0, 0), (0, 0, config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
+                config.current_scene.draw(screen)
+            profiler.mark("scene")
+            if config.ENABLE_PYGAME_LOG:
+                PygameLogManager.Instance.draw(screen)
+                profiler.draw(screen)
+            profiler.mark("overlay")
+
+            pygame.display.flip()
+            profiler.mark("flip")
+            dirty_frame = False
+        # What the frame queued to send goes out as one batch
+        config.pgnm.flush()
+        profiler.mark("network")
+        profiler.end_frame()
+        # Phases are only recorded while the debug console shows them
+        profiler.set_enabled(config.ENABLE_PYGAME_LOG)
         clock.tick(60)
         await asyncio.sleep(0)
 
@@ -72,5 +102,6 @@ if __name__ == "__main__":
     PygameLogManager.setup()
     SaveManager.setup()
     config.assets = AssetManager("assets.zip")
+    config.resources = ResourceManager(config.assets)
     config.gm = GameManager()
     asyncio.run(main())
@@ -0,0 +1,73 @@
+import pygame
+
+
+class DirtyRectRenderer:
+    """
+    Redraws only the parts of the screen that changed since the previous frame.
+
+    A scene describes a frame as items in painter's order: (key, rect, signature, draw, args). An item
+    is dirty when it is new, gone, moved or its signature changed. The background is restored under
+    every dirty rect and the items overlapping it are drawn again, clipped to it.
+    """
+
+    # Above this share of the screen one full redraw is cheaper than many small ones
+    FULL_REDRAW_RATIO = 0.5
+
+    def __init__(self):
+        self.previous = None
+        self.background = None
+
+    def invalidate(self):
+        self.previous = None
+
+    def dirty_rects(self, items, screen_rect: pygame.Rect) -> [pygame.Rect]:
+        if self.previous is None:
+            return [screen_rect]
+
+        rects = []
+        seen = set()
+        for key, rect, signature, _, _ in items:
+            seen.add(key)
+            previous = self.previous.get(key)
+            if previous is None:
+                rects.append(rect)
+            elif previous[0] != rect or previous[1] != signature:
+                rects.append(rect)
+                rects.append(previous[0])
+        for key, (rect, _) in self.previous.items():
+            if key not in seen:
+                rects.append(rect)
+
+        merged = []
+        for rect in rects:
+            rect = rect.clip(screen_rect)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect.union_ip(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+
+        if sum(rect.width * rect.height for rect in merged) > screen_rect.width * screen_rect.height * DirtyRectRenderer.FULL_REDRAW_RATIO:
+            return [screen_rect]
+        return merged
+
+    def render(self, surface: pygame.Surface, background: pygame.Surface, items) -> [pygame.Rect]:
+        # A new background, e.g. a rebuilt static layer, can differ anywhere
+        if background is not self.background:
+            self.invalidate()
+            self.background = background
+        dirty = self.dirty_rects(items, surface.get_rect())
+
+        item_rects = [item[1] for item in items]
+        for rect in dirty:
+            surface.set_clip(rect)
+            surface.blit(background, rect, rect)
+            for i in rect.collidelistall(item_rects):
+                _, _, _, draw, args = items[i]
+                draw(surface, *args)
+        surface.set_clip(None)
+
+        self.previous = {key: (rect, signature) for key, rect, signature, _, _ in items}
+        return dirty
@@ -0,0 +1,108 @@
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+import config
+
+
+class FrameProfiler:
+    """
+    Times the phases of each frame and draws rolling percentiles and a frame-time graph.
+
+    mark(phase) charges the time since the previous mark to phase. Nothing is recorded while the
+    profiler is disabled, so the marks can stay in place for production builds.
+    """
+
+    Instance = None
+
+    HISTORY = 240
+    GRAPH_FRAMES = 120
+    BUDGET_MS = 1000 / 60
+
+    def __init__(self):
+        self.enabled = False
+        self.font = None
+
+        self.phases : {str: deque} = {}
+        self.frames = deque(maxlen=FrameProfiler.HISTORY)
+        self.current : {str: float} = {}
+        self.started = 0
+        self.last = 0
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.started = self.last = time.perf_counter()
+        self.current = {}
+
+    def mark(self, phase: str):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0) + (now - self.last) * 1000
+        self.last = now
+
+    def end_frame(self):
+        if not self.enabled or not self.started:
+            return
+        for phase, ms in self.current.items():
+            if phase not in self.phases:
+                self.phases[phase] = deque(maxlen=FrameProfiler.HISTORY)
+            self.phases[phase].append(ms)
+        self.frames.append((time.perf_counter() - self.started) * 1000)
+
+    def set_enabled(self, enabled: bool):
+        if enabled and not self.enabled:
+            # Stale samples from the last time the overlay was open would skew the percentiles
+            self.phases.clear()
+            self.frames.clear()
+            self.started = 0
+        self.enabled = enabled
+
+    def draw(self, surface):
+        if not self.frames:
+            return
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+
+        rows = [("frame", self.frames)] + list(self.phases.items())
+        line = self.font.get_linesize()
+        graph_height = 60
+        width = 360
+        height = line * (len(rows) + 1) + graph_height + 20
+        x, y = config.SCREEN_WIDTH - width - 10, config.SCREEN_HEIGHT - height - 10
+
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 190))
+        surface.blit(panel, (x, y))
+
+        # The default font is proportional, so every column is right-aligned on its own
+        color = (255, 235, 42)
+        columns = (x + 170, x + 240, x + 310)
+        surface.blit(self.font.render("phase (ms)", True, color), (x + 10, y + 5))
+        for right, title in zip(columns, ("p50", "p95", "p99")):
+            text = self.font.render(title, True, color)
+            surface.blit(text, (right - text.get_width(), y + 5))
+        for i, (name, samples) in enumerate(rows):
+            row_y = y + 5 + line * (i + 1)
+            surface.blit(self.font.render(name, True, color), (x + 10, row_y))
+            for right, value in zip(columns, np.percentile(samples, (50, 95, 99))):
+                text = self.font.render(f"{value:.2f}", True, color)
+                surface.blit(text, (right - text.get_width(), row_y))
+
+        # Frame-time graph, the line marks the 60 FPS budget
+        graph_y = y + height - graph_height - 10
+        scale = graph_height / (FrameProfiler.BUDGET_MS * 2)
+        frames = list(self.frames)[-FrameProfiler.GRAPH_FRAMES:]
+        bar = (width - 20) / FrameProfiler.GRAPH_FRAMES
+        for i, ms in enumerate(frames):
+            bar_height = min(ms * scale, graph_height)
+            bar_color = (90, 200, 90) if ms <= FrameProfiler.BUDGET_MS else (220, 70, 70)
+            pygame.draw.rect(surface, bar_color, (x + 10 + i * bar, graph_y + graph_height - bar_height, max(bar, 1), bar_height))
+        budget_y = graph_y + graph_height - FrameProfiler.BUDGET_MS * scale
+        pygame.draw.line(surface, color, (x + 10, budget_y), (x + width - 10, budget_y))
+
+
+FrameProfiler.Instance = FrameProfiler()
@@ -1,7 +1,5 @@
 import logging
-import math
 import random
-import time
 import uuid
 from enum import Enum
 
@@ -9,9 +7,12 @@ import pygame
 
 import config
 from data.game_data import GameData
+from data.state_replicator import StateReplicator
 from entities.connection import Connection
 from entities.planet import Planet
 from scenes.info_scene import InfoScene
+from simulation.planet_generator import PlanetGenerator
+from simulation.simulation_engine import SimulationEngine
 
 logger = logging.getLogger(__name__)
 
@@ -26,16 +27,19 @@ class GameManager:
     def __init__(self):
         logger.info("Initializing GameManager")
         self.data : GameData = None
+        self.engine : SimulationEngine = None
         self.ticks = 0
 
-        self.enemy_ai_done = False
-
         self.game_mode : GameMode = None
 
         # Networking
-        self.last_tick_sync = 0
         self.offer_last_tick = 0
         self.conn = None
+        self.replicator : StateReplicator = None
+        self.last_replication = 0
+        self.last_keyframe = 0
+        self.last_ack = 0
+        self.resync_from = None
 
     def new_game(self, mode: GameMode, lobby = None):
         from scenes.game_scene import GameScene
@@ -45,23 +49,28 @@ class GameManager:
         logger.info(f"Creating new game {mode}, lobby: {lobby}")
 
         if self.game_mode == GameMode.SINGLE_PLAYER:
-            self.data = GameData(config.PLAYER_COLOR, None, 2100, 2100, 1)
+            self.set_data(GameData(config.PLAYER_COLOR, None, 2100, 2100, 1))
             self.generate_planets()
         elif self.game_mode == GameMode.LOCAL_TWO_PLAYER:
-            self.data = GameData(config.PLAYER_COLOR, config.PLAYER2_COLOR, 2100, 2100, 1)
+            self.set_data(GameData(config.PLAYER_COLOR, config.PLAYER2_COLOR, 2100, 2100, 1))
             self.generate_planets()
         elif self.game_mode == GameMode.HOST:
-            self.data = GameData(config.PLAYER_COLOR, config.PLAYER2_COLOR, 2100, 2100, 1)
-            self.generate_planets(1, 3)
-            self.lobby_id = str(uuid.uuid4())
+            self.host_game()
         elif self.game_mode == GameMode.CLIENT:
             config.pgnm.join_lobby(lobby)
             self.conn = lobby['lobby_name']
+            self.replicator = StateReplicator()
         else:
             raise ValueError(f"Wrong game mode: {self.game_mode}")
 
         config.set_scene(GameScene(self))
 
+    def host_game(self):
+        """A fresh two player board, and the lobby id it is offered under."""
+        self.set_data(GameData(config.PLAYER_COLOR, config.PLAYER2_COLOR, 2100, 2100, 1))
+        self.generate_planets(1, 3)
+        self.lobby_id = str(uuid.uuid4())
+        self.replicator = StateReplicator()
 
     def next_level(self):
         if self.game_mode in (GameMode.CLIENT, GameMode.HOST):
@@ -69,7 +78,7 @@ class GameManager:
             config.set_scene(GameConfigScene())
         else:
             from scenes.game_scene import GameScene
-            self.data = GameData(self.data.p1color, self.data.p2color, self.data.year, self.data.year_start, self.data.level + 1)
+            self.set_data(GameData(self.data.p1color, self.data.p2color, self.data.year, self.data.year_start, self.data.level + 1))
             self.generate_planets()
             config.set_scene(GameScene(self))
 
@@ -77,7 +86,7 @@ class GameManager:
         from scenes.game_scene import GameScene
         try:
             logger.info(f"Loading game from {selected_file}")
-            self.data = GameData.load_json(selected_file)
+            self.set_data(GameData.load_json(selected_file))
 
             config.set_scene(GameScene(self))
 
@@ -86,6 +95,12 @@ class GameManager:
             from scenes.info_scene import InfoScene
             config.set_scene(InfoScene(f"Load failed!\n{str(e)}", 3, self))
 
+    def set_data(self, data: GameData):
+        self.data = data
+        self.engine = SimulationEngine(data, enemy_ai=self.game_mode not in (GameMode.HOST, GameMode.CLIENT),
+                                       replica=self.game_mode == GameMode.CLIENT)
+        self.ticks = pygame.time.get_ticks()
+
     def tick(self):
         if self.game_mode == GameMode.HOST and self.conn is None:
             self.ticks = pygame.time.get_ticks()
@@ -98,56 +113,23 @@ class GameManager:
             self.ticks = pygame.time.get_ticks()
             return
 
-        self.data.current_ticks += pygame.time.get_ticks() - self.ticks
+        dt = pygame.time.get_ticks() - self.ticks
         self.ticks = pygame.time.get_ticks()
 
-        if self.game_mode == GameMode.HOST and self.data.current_ticks - self.last_tick_sync > 2500:
-            self.last_tick_sync = self.data.current_ticks
-            self.sync_ticks()
-
-        all_colors = sorted(set(planet.color for planet in self.data.planets))
-        all_playing_colors = sorted(
-            set(planet.color for planet in self.data.planets if planet.color != config.NO_OWNER_COLOR))
-
-        # Turn time
-        if self.data.current_ticks - self.data.current_turn_start > config.TURN_TIME or self.data.current_turn_color not in all_playing_colors:
-            idx = all_playing_colors.index(
-                self.data.current_turn_color) + 1 if self.data.current_turn_color in all_playing_colors else 0
-            if idx >= len(all_playing_colors):
-                self.data.year += 1
-
+        turn_start = self.data.current_turn_start
+        self.engine.step(dt)
+        if self.data.current_turn_start != turn_start:
             config.current_scene.dragging_card = None
-            self.data.current_turn_color = all_playing_colors[idx % len(all_playing_colors)]
-            self.data.current_turn_start = self.data.current_ticks
-
-            if self.data.current_turn_color not in (self.data.p1color, self.data.p2color):
-                self.enemy_ai_done = False
-
-
-        # Enemy AI
-        if self.game_mode not in (GameMode.HOST, GameMode.CLIENT):
-            if self.data.current_turn_color not in (self.data.p1color, self.data.p2color) and not self.enemy_ai_done:
-                self.run_enemy_ai_turn()
 
-            for color in sorted(set(planet.color for planet in self.data.planets if
-                                    planet.color != config.NO_OWNER_COLOR and planet.color not in (
-                                    self.data.p1color, self.data.p2color))):
-                self.run_enemy_ai_continous(color)
-
-
-        # Update black surface
-        for planet in self.data.planets:
-            if config.current_scene.dragging_card == 0:
-                planet.apply_black_surface = not (
-                        planet.color == self.data.current_turn_color and planet.value > config.SATELLITE_COST)
-            elif config.current_scene.dragging_card == 1:
-                planet.apply_black_surface = not (
-                        planet.color == self.data.current_turn_color and planet.value > config.ROCKET_COST)
+        if self.game_mode == GameMode.HOST:
+            self.replicate()
+        elif self.game_mode == GameMode.CLIENT:
+            self.acknowledge()
 
         # End condition
-        if len(all_colors) == 1:
+        if self.engine.winner is not None:
             from scenes.menu_scene import MenuScene
-            if all_colors.pop() in (self.data.p1color, self.data.p2color):
+            if self.engine.winner in (self.data.p1color, self.data.p2color):
                 logger.info("win")
                 self.data.level += 1
                 from scenes.game_next_level_scene import NextLevelScene
@@ -183,14 +165,6 @@ class GameManager:
         else:
             logger.error(f"Wrong card type: {card}")
 
-        if self.game_mode == GameMode.HOST:
-            update_message = {
-                "action": "card_dropped",
-                "planet_index": self.data.planets.index(planet),
-                "card": card
-            }
-            self.send_network_message(update_message)
-
     def connection_created(self, planet: Planet, other_planet: Planet):
         if self.game_mode == GameMode.CLIENT:
             message = {
@@ -202,17 +176,9 @@ class GameManager:
             self.send_network_message(message)
             return
 
-        self.data.connections.append(Connection(planet, other_planet))
+        self.data.add_connection(Connection(planet, other_planet))
         logger.info(f"Connection created between {planet} and {other_planet}")
 
-        if self.game_mode == GameMode.HOST:
-            update_message = {
-                "action": "connection_created",
-                "source_index": self.data.planets.index(planet),
-                "target_index": self.data.planets.index(other_planet)
-            }
-            self.send_network_message(update_message)
-
     def connection_deleted(self, connection: Connection):
         if self.game_mode == GameMode.CLIENT:
             message = {
@@ -222,71 +188,29 @@ class GameManager:
             }
             self.send_network_message(message)
             return
-        elif self.game_mode == GameMode.HOST:
-            update_message = {
-                "action": "connection_deleted",
-                "connection_index": self.data.connections.index(connection),
-            }
-            self.send_network_message(update_message)
-
-        self.data.connections.remove(connection)
-
-    # Enemy AI
-
-    def run_enemy_ai_turn(self):
-        enemy_planets = [planet for planet in self.data.planets if planet.color == self.data.current_turn_color]
-        if not enemy_planets:
-            self.enemy_ai_done = True
-            return
-
-        # Prioritize upgrading planets with higher values
-        chosen = max(enemy_planets, key=lambda p: p.value, default=None)
-        if chosen:
-            if chosen.value > config.SATELLITE_COST and chosen.satellite_upgrade < 6:
-                chosen.satellite_upgrade += 1
-                chosen.value -= config.SATELLITE_COST
-                logger.info(
-                    f"Enemy {self.data.current_turn_color} {chosen} upgraded Satellite, new upgrade: {chosen.satellite_upgrade}")
-            elif chosen.value > config.ROCKET_COST and chosen.rocket_upgrade < 4:
-                chosen.rocket_upgrade += 1
-                chosen.value -= config.ROCKET_COST
-                logger.info(
-                    f"Enemy {self.data.current_turn_color} {chosen} upgraded Rocket, new upgrade: {chosen.rocket_upgrade}")
-        self.enemy_ai_done = True
-
-    def run_enemy_ai_continous(self, color: (int, int, int)):
-        # Try to make a new connection to weaker enemy or neutral planets
-        if random.random() > 0.005:
-            return
 
-        enemy_planets = [planet for planet in self.data.planets if planet.color == color]
-        source = random.choice(enemy_planets)
-        candidates = []
-        for candidate in self.data.planets:
-            if candidate != source and candidate.color != color:
-                # Check if there is already a connection between source and candidate
-                already_connected = any(
-                    (connection.planet == source and connection.other_planet == candidate) or
-                    (connection.planet == candidate and connection.other_planet == source)
-                    for connection in self.data.connections
-                )
-                if not already_connected:
-                    candidates.append(candidate)
-
-        if candidates:
-            # Prioritize weaker planets (lower value)
-            target = min(candidates, key=lambda p: p.value, default=None)
-            if target:
-                self.data.connections.append(Connection(source, target))
-                logger.info(f"Enemy connection made between {source} and {target}")
+        self.data.remove_connection(connection)
 
-    def generate_planets(self, enemy_ct = None, enemy_planets = None):
+    def generate_planets(self, enemy_ct = None, enemy_planets = None, seed = None):
         if enemy_ct is None:
             enemy_ct = round(1.5 ** self.data.level - 0.5)
         if enemy_planets is None:
             enemy_planets = round(1.2 ** self.data.level)
+        if seed is None:
+            seed = random.getrandbits(32)
+
+        logger.info(f"Generating planets: level: {self.data.level}, enemy_ct: {enemy_ct}, enemy_planets: {enemy_planets}, seed: {seed}")
 
-        logger.info(f"Generating planets: level: {self.data.level}, enemy_ct: {enemy_ct}, enemy_planets: {enemy_planets}")
+        rng = random.Random(seed)
+        generator = PlanetGenerator(config.PLANET_RADIUS * 2, config.PLANET_RADIUS * 2,
+                                    config.GAME_SCENE_WIDTH - config.PLANET_RADIUS * 2, config.GAME_SCENE_HEIGHT - config.PLANET_RADIUS * 2,
+                                    2 * config.PLANET_RADIUS, rng)
+
+        # All positions are sampled before any planet is placed, so a board that is too small is known up front
+        requested = (enemy_ct + 2) * enemy_planets
+        positions = generator.sample(requested)
+        if len(positions) < requested:
+            logger.warning(f"Only {len(positions)} of {requested} planets fit on the board, the last colors get fewer planets")
 
         for i in range(-2, enemy_ct):
             if i == -1:
@@ -297,37 +221,21 @@ class GameManager:
                 color = self.data.p2color
             else:
                 color = (
-                    random.randint(50, 255),
-                    random.randint(50, 255),
-                    random.randint(50, 255)
+                    rng.randint(50, 255),
+                    rng.randint(50, 255),
+                    rng.randint(50, 255)
                 )
 
             for _ in range(0, enemy_planets):
-                while True:
-                    ok = True
-                    x = random.uniform(config.PLANET_RADIUS * 2, config.GAME_SCENE_WIDTH - config.PLANET_RADIUS * 2)
-                    y = random.uniform(config.PLANET_RADIUS * 2, config.GAME_SCENE_HEIGHT - config.PLANET_RADIUS * 2)
-
-                    candidate_center = (x + config.PLANET_RADIUS, y + config.PLANET_RADIUS)
-
-                    for planet in self.data.planets:
-                        dx = candidate_center[0] - planet.center_x
-                        dy = candidate_center[1] - planet.center_y
-                        distance = math.hypot(dx, dy)
-
-                        if distance < 2 * config.PLANET_RADIUS:
-                            ok = False
-                            break
-
-                    if ok:
-                        break
-
-                self.data.planets.append(Planet(x, y, color))
+                if not positions:
+                    return
+                x, y = positions.pop()
+                self.data.add_planet(Planet(x, y, color))
 
     # Networking
 
     def send_network_message(self, message: dict):
-        config.pgnm.node.privmsg_b64json(self.conn, {'type': 'message', 'message': message})
+        config.pgnm.node.privmsg_encoded(self.conn, {'type': 'message', 'message': message})
 
     def process_network_message(self, message: dict):
         action = message.get("action")
@@ -345,92 +253,77 @@ class GameManager:
                     if planet.value > config.ROCKET_COST and planet.rocket_upgrade < 4:
                         planet.rocket_upgrade += 1
                         planet.value -= config.ROCKET_COST
-                # Broadcast update.
-                update_message = {
-                    "action": "card_dropped",
-                    "planet_index": planet_index,
-                    "card": card
-                }
-                self.send_network_message(update_message)
             elif action == "connection_created":
                 source_index = message.get("source_index")
                 target_index = message.get("target_index")
                 source = self.data.planets[source_index]
                 target = self.data.planets[target_index]
-                self.data.connections.append(Connection(source, target))
-                update_message = {
-                    "action": "connection_created",
-                    "source_index": source_index,
-                    "target_index": target_index
-                }
-                self.send_network_message(update_message)
+                self.data.add_connection(Connection(source, target))
             elif action == "connection_deleted":
                 try:
                     connection_index = message.get("connection_index")
                     if 0 <= connection_index < len(self.data.connections):
-                        self.data.connections.pop(connection_index)
-
-                    update_message = {
-                        "action": "connection_deleted",
-                        "connection_index": connection_index,
-                    }
-                    self.send_network_message(update_message)
+                        self.data.remove_connection(self.data.connections[connection_index])
                 except Exception as e:
                     logger.error("Error processing connection deletion request: " + str(e))
+            elif action == "state_ack":
+                self.replicator.acknowledge(message.get("version"))
+                if message.get("resync"):
+                    self.resend_state(message.get("version"))
+            # The changes reach the client with the next delta
             return
 
         if self.game_mode == GameMode.CLIENT:
-            if action == "full_sync":
-                game_data_dict = message.get("game_data")
-                self.data = GameData.from_dict(game_data_dict)
-
-                logger.info(game_data_dict)
-
-                self.data.p1color = config.PLAYER2_COLOR
-                self.data.p2color = config.PLAYER_COLOR
-
-                logger.info("Received full game sync from host")
-            elif action == "card_dropped":
-                planet_index = message.get("planet_index")
-                card = message.get("card")
-                planet = self.data.planets[planet_index]
-                if card == 0:
-                    planet.satellite_upgrade += 1
-                    planet.value -= config.SATELLITE_COST
-                elif card == 1:
-                    planet.rocket_upgrade += 1
-                    planet.value -= config.ROCKET_COST
-                logger.info("Processed card_dropped update from host")
-            elif action == "connection_created":
-                source_index = message.get("source_index")
-                target_index = message.get("target_index")
-                source = self.data.planets[source_index]
-                target = self.data.planets[target_index]
-                self.data.connections.append(Connection(source, target))
-                logger.info("Processed connection_created update from host")
-            elif action == "connection_deleted":
-                self.data.connections.pop(message.get("connection_index"))
-            elif action == "tick_sync":
-                new_ticks = int(message.get("ticks"))
-                send_timestamp = int(message.get("send_timestamp"))
-                client_receive = int(time.time() * 1000)
-                offset = client_receive - send_timestamp
-                logger.debug(f"Host synced ticks: old={self.data.current_ticks}, new={new_ticks}, offset={offset}")
-                self.data.current_ticks = new_ticks + offset
+            if action == "keyframe":
+                data = self.replicator.apply_keyframe(message, self.data)
+                if data is not self.data:
+                    self.set_data(data)
+                    self.data.p1color = config.PLAYER2_COLOR
+                    self.data.p2color = config.PLAYER_COLOR
+                logger.info(f"Received keyframe {message.get('version')} from host")
+            elif action == "delta":
+                if self.data is not None and self.replicator.apply_delta(self.data, message):
+                    return
+                # Later deltas will not follow either, one request per version is enough
+                if self.resync_from != self.replicator.version:
+                    self.resync_from = self.replicator.version
+                    logger.warning(f"Delta {message.get('version')} does not follow {self.replicator.version}, asking for a resync")
+                    self.send_network_message({"action": "state_ack", "version": self.replicator.version, "resync": True, "request": True})
 
     def send_full_data(self):
         if self.game_mode == GameMode.HOST and self.conn:
-            message = {
-                "action": "full_sync",
-                "game_data": self.data.to_dict()
-            }
-            self.send_network_message(message)
-
-    def sync_ticks(self):
-        if self.game_mode == GameMode.HOST and self.conn:
-            message = {
-                "action": "tick_sync",
-                "send_timestamp": int(time.time() * 1000),
-                "ticks": self.data.current_ticks
-            }
-            self.send_network_message(message)
+            self.last_replication = self.last_keyframe = self.data.current_ticks
+            self.send_network_message(self.replicator.keyframe(self.data))
+
+    def resend_state(self, version: int):
+        """Sends a client at version what it missed as one delta, or a keyframe if the deltas are gone."""
+        missed = self.replicator.missed(version)
+        if missed is None:
+            self.send_full_data()
+        elif missed:
+            self.send_network_message(StateReplicator.merge(missed))
+
+    def replicate(self):
+        # While offline nothing is sent, the first delta after the reconnect covers the gap
+        if not self.conn or not config.pgnm.node.connected():
+            return
+        # Keyframes now and then are a safety net, deltas alone keep the client in step
+        if self.data.current_ticks - self.last_keyframe >= config.REPLICATION_KEYFRAME_MS:
+            self.send_full_data()
+        elif self.data.current_ticks - self.last_replication >= config.REPLICATION_INTERVAL_MS:
+            self.last_replication = self.data.current_ticks
+            message = self.replicator.delta(self.data)
+            if message is not None:
+                self.send_network_message(message)
+
+    def resume_network(self):
+        """After a reconnect the client tells the host its version, and gets what it missed since."""
+        if self.game_mode == GameMode.CLIENT and self.conn and self.replicator is not None:
+            self.resync_from = self.replicator.version
+            self.send_network_message({"action": "state_ack", "version": self.replicator.version, "resync": True, "request": True})
+
+    def acknowledge(self):
+        if self.replicator.version > self.replicator.acknowledged and self.ticks - self.last_ack >= config.REPLICATION_ACK_MS:
+            self.last_ack = self.ticks
+            self.replicator.acknowledged = self.replicator.version
+            self.send_network_message({"action": "state_ack", "version": self.replicator.version, "request": True})
@@ -0,0 +1,44 @@
+import pygame
+
+import config
+from managers.sprite_cache import SpriteCache
+
+
+class LabelCache:
+    """
+    Rendered text labels keyed by (font, size, text, colour), evicted least recently used.
+
+    Labels made only of digits and '/' are composed from a glyph atlas rendered once per font and
+    colour, so a planet value that changed costs a few blits instead of a text render.
+    """
+
+    GLYPHS = "0123456789/"
+
+    def __init__(self, name: str, max_bytes: int):
+        self.labels = SpriteCache(name, max_bytes)
+        self.atlases = {}
+
+    def atlas(self, font_name: str, size: int, color) -> dict:
+        key = (font_name, size, color)
+        if key not in self.atlases:
+            font = config.resources.font(font_name, size)
+            self.atlases[key] = {glyph: font.render(glyph, True, color) for glyph in LabelCache.GLYPHS}
+        return self.atlases[key]
+
+    def compose(self, font_name: str, size: int, text: str, color) -> pygame.Surface:
+        if not text or any(glyph not in LabelCache.GLYPHS for glyph in text):
+            return config.resources.font(font_name, size).render(text, True, color)
+
+        glyphs = [self.atlas(font_name, size, color)[glyph] for glyph in text]
+        label = pygame.Surface((sum(glyph.get_width() for glyph in glyphs), max(glyph.get_height() for glyph in glyphs)), pygame.SRCALPHA)
+        x = 0
+        for glyph in glyphs:
+            label.blit(glyph, (x, 0))
+            x += glyph.get_width()
+        return label
+
+    def render(self, font_name: str, size: int, text: str, color) -> pygame.Surface:
+        return self.labels.get((font_name, size, text, color), lambda: self.compose(font_name, size, text, color))
+
+    def stats(self) -> dict:
+        return self.labels.stats()
@@ -0,0 +1,31 @@
+import pygame
+
+
+class LayerCompositor:
+    """
+    Keeps static layers pre-blended over the background in one opaque surface.
+
+    draw paints the static layers; it runs again only when the signature describing them changes
+    or a different background is passed in, so a frame starts from a single blit.
+    """
+
+    def __init__(self):
+        self.surface = None
+        self.signature = None
+        self.background = None
+        self.rebuilds = 0
+
+    def invalidate(self):
+        self.surface = None
+
+    def get(self, background: pygame.Surface, signature, draw) -> pygame.Surface:
+        if self.surface is None or signature != self.signature or background is not self.background:
+            surface = pygame.Surface(background.get_size())
+            surface.blit(background, (0, 0))
+            draw(surface)
+
+            self.surface = surface
+            self.signature = signature
+            self.background = background
+            self.rebuilds += 1
+        return self.surface
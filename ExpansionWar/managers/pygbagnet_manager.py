@@ -22,11 +22,14 @@ class PygbagnetManager:
 
         self._handlers: dict[Any, PygbagnetManager._Handler] = {
             node.CONNECTED: self._on_connected,
+            node.RECONNECTED: self._on_reconnected,
             node.JOINED: self._on_joined,
             node.GLOBAL: self._on_global,
             node.SPURIOUS: self._on_spurious,
             node.USERLIST: self._on_userlist,
             node.USERS: self._ignore,
+            node.PING: self._ignore,
+            node.PONG: self._ignore,
             node.RAW: self._on_raw,
             node.B64JSON: self._on_b64json,
         }
@@ -40,6 +43,10 @@ class PygbagnetManager:
 
         await asyncio.sleep(0)
 
+    def flush(self) -> None:
+        """Sends the messages queued this frame."""
+        self.node.flush()
+
     async def _dispatch(self, ev) -> None:
         """Route an event to its dedicated handler."""
         handler = self._handlers.get(ev, self._on_unknown)
@@ -50,6 +57,10 @@ class PygbagnetManager:
     async def _on_connected(self, _) -> None:
         logger.info("CONNECTED as %s", self.node.nick)
 
+    async def _on_reconnected(self, _) -> None:
+        logger.info("RECONNECTED as %s", self.node.nick)
+        config.gm.resume_network()
+
     async def _on_joined(self, _) -> None:
         logger.info("Entered channel %s", self.node.current_channel)
 
@@ -73,15 +84,19 @@ class PygbagnetManager:
             offer = data['offer']
             logger.info("Received offer: %s", offer)
             self.offers[offer['id']] = offer
+            self.node.agree(offer['lobby_name'], offer.get('codecs', ()))
         elif data['type'] == "join":
             logger.info(f"Received join: {data} -> {data['nick']}")
+            self.node.agree(data['nick'], data.get('codecs', ()))
             config.gm.conn = data['nick']
             config.gm.send_full_data()
         elif data['type'] == 'message':
-            logger.info(f"Received message: {data}")
-            config.gm.process_network_message(data['message'])
-
-        logger.debug("B64JSON: %s", data)
+            # Deltas arrive several times a second and keyframes are large, so only what they are is logged
+            message = data['message']
+            logger.debug("Received message: %s %s", message.get('action'), message.get('version', ''))
+            config.gm.process_network_message(message)
+        else:
+            logger.debug("B64JSON: %s", data)
 
     async def _on_unknown(self, ev) -> None:
         logger.warning("Unhandled event: %s – rxq=%s", ev, self.node)
@@ -90,10 +105,10 @@ class PygbagnetManager:
         return
 
     def offer_lobby(self, lobby_id):
-        offer = {'type': 'offer', 'offer': {'id': lobby_id,'lobby_name': config.pgnm.node.nick } }
+        offer = {'type': 'offer', 'offer': {'id': lobby_id,'lobby_name': config.pgnm.node.nick, 'codecs': self.node.codec_names() } }
         self.node.tx(offer)
         logger.info(f"Created lobby: {lobby_id}")
 
     def join_lobby(self, lobby: dict):
         logger.info(f"Connected to lobby: {lobby}")
-        self.node.privmsg_b64json(lobby['lobby_name'], {'type': 'join', 'nick': config.pgnm.node.nick })
+        self.node.privmsg_b64json(lobby['lobby_name'], {'type': 'join', 'nick': config.pgnm.node.nick, 'id': lobby['id'], 'codecs': self.node.codec_names() })
@@ -0,0 +1,61 @@
+import logging
+
+import pygame
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceManager:
+    """
+    Process-wide cache of fonts, decoded images and scaled images loaded from the asset zip.
+
+    Entries are keyed by (asset, size, transform) and shared by every caller, so they must be treated
+    as read-only: blit from them, never draw onto them.
+    """
+
+    KINDS = ('font', 'image', 'scaled')
+
+    def __init__(self, assets):
+        self.assets = assets
+        self.resources = {}
+
+        self.hits = dict.fromkeys(ResourceManager.KINDS, 0)
+        self.misses = dict.fromkeys(ResourceManager.KINDS, 0)
+
+    def get(self, key, create):
+        resource = self.resources.get(key)
+        if resource is not None:
+            self.hits[key[0]] += 1
+            return resource
+
+        self.misses[key[0]] += 1
+        resource = create()
+        self.resources[key] = resource
+        return resource
+
+    def font(self, asset_name: str, size: int) -> pygame.font.Font:
+        return self.get(('font', asset_name, size, None), lambda: pygame.font.Font(self.assets[asset_name], size))
+
+    def image(self, asset_name: str) -> pygame.Surface:
+        return self.get(('image', asset_name, None, None), lambda: pygame.image.load(self.assets[asset_name]))
+
+    def scaled(self, asset_name: str, size: (int, int)) -> pygame.Surface:
+        size = (int(size[0]), int(size[1]))
+        return self.get(('scaled', asset_name, size, 'scale'), lambda: pygame.transform.scale(self.image(asset_name), size))
+
+    def scaled_by(self, asset_name: str, divisor: int) -> pygame.Surface:
+        image = self.image(asset_name)
+        return self.scaled(asset_name, (image.get_width() / divisor, image.get_height() / divisor))
+
+    def clear(self):
+        self.resources.clear()
+
+    def stats(self) -> dict:
+        return {
+            kind: {
+                'entries': sum(1 for key in self.resources if key[0] == kind),
+                'hits': self.hits[kind],
+                'misses': self.misses[kind],
+            }
+            for kind in ResourceManager.KINDS
+        }
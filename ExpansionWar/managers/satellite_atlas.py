@@ -0,0 +1,57 @@
+import math
+
+import pygame
+
+import config
+
+
+class SatelliteAtlas:
+    """
+    Satellite sprites pre-rotated every config.SATELLITE_ANGLE_STEP degrees, plus the orbit positions
+    for one planet radius. Shared by every planet with the same satellite texture and radius.
+    """
+
+    Rotations = {}
+    Atlases = {}
+
+    @staticmethod
+    def get(texture_name: str, planet_radius: float) -> 'SatelliteAtlas':
+        key = (texture_name, planet_radius)
+        if key not in SatelliteAtlas.Atlases:
+            SatelliteAtlas.Atlases[key] = SatelliteAtlas(texture_name, planet_radius)
+        return SatelliteAtlas.Atlases[key]
+
+    @staticmethod
+    def rotations(texture_name: str) -> list:
+        if texture_name not in SatelliteAtlas.Rotations:
+            satellite = pygame.transform.rotate(config.resources.scaled_by(texture_name, 6), -90)
+
+            # Sprite k faces the planet from orbit angle k * step, the same way rotating by atan2 did
+            sprites = []
+            for k in range(round(360 / config.SATELLITE_ANGLE_STEP)):
+                sprite = pygame.transform.rotate(satellite, 180 - k * config.SATELLITE_ANGLE_STEP)
+                sprites.append((sprite, sprite.get_width() / 2, sprite.get_height() / 2))
+            SatelliteAtlas.Rotations[texture_name] = (satellite.get_width(), sprites)
+        return SatelliteAtlas.Rotations[texture_name]
+
+    def __init__(self, texture_name: str, planet_radius: float):
+        width, self.sprites = SatelliteAtlas.rotations(texture_name)
+        self.orbit_radius = planet_radius + (width // 2) + 5
+        # How far a sprite sticks out from its orbit position, in any rotation
+        self.reach = max(max(half_width, half_height) for _, half_width, half_height in self.sprites)
+
+        # Positions are kept finer than the sprites, about one pixel of arc apart, so big orbits still move smoothly
+        self.position_count = max(len(self.sprites), math.ceil(2 * math.pi * self.orbit_radius))
+        self.positions = []
+        for i in range(self.position_count):
+            angle = 2 * math.pi * i / self.position_count
+            self.positions.append((self.orbit_radius * math.cos(angle), self.orbit_radius * math.sin(angle)))
+
+    def index(self, orbit_angle_degrees: float) -> (int, int):
+        return (round(orbit_angle_degrees / config.SATELLITE_ANGLE_STEP) % len(self.sprites),
+                round(orbit_angle_degrees * self.position_count / 360) % self.position_count)
+
+    def lookup(self, orbit_angle_degrees: float):
+        """Returns (sprite, half width, half height) and the (x, y) offset from the planet center."""
+        sprite_index, position_index = self.index(orbit_angle_degrees)
+        return self.sprites[sprite_index], self.positions[position_index]
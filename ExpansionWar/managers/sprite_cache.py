@@ -0,0 +1,62 @@
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class SpriteCache:
+    """LRU cache of pygame surfaces, capped by the memory their pixels take."""
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.surfaces = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def surface_bytes(surface) -> int:
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def get(self, key, create):
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = create()
+        self.surfaces[key] = surface
+        self.bytes += SpriteCache.surface_bytes(surface)
+
+        # The surface just created is never evicted, even if it alone is over the cap
+        while self.bytes > self.max_bytes and len(self.surfaces) > 1:
+            _, evicted = self.surfaces.popitem(last=False)
+            self.bytes -= SpriteCache.surface_bytes(evicted)
+            self.evictions += 1
+
+        return surface
+
+    def __contains__(self, key):
+        return key in self.surfaces
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            'name': self.name,
+            'entries': len(self.surfaces),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -1,18 +1,19 @@
 import asyncio
+import random
 import sys
 import time
 import select
-import json
-import base64
-import io
 import traceback
 import socket
+from collections import deque
+
+from pygbagnet.wire_codec import BinaryCodec, JsonCodec
 
 class WebsocketWrapper:
     def __init__(self):
         import websockets
         self._websocket : websockets.ClientConnection = None
-        self.recv_buffer = b''
+        self.recv_buffer = bytearray()
 
     async def connect(self, host, port):
         import websockets
@@ -26,13 +27,24 @@ class WebsocketWrapper:
         await self._websocket.close()
 
     def recv(self, size, t):
-        ret = self.recv_buffer[0].to_bytes()
-        self.recv_buffer = self.recv_buffer[1:]
+        """Up to size bytes (all with -1) of the frames received, b'' once the connection closed."""
+        if size < 0 or size >= len(self.recv_buffer):
+            ret = bytes(self.recv_buffer)
+            self.recv_buffer.clear()
+        else:
+            ret = bytes(self.recv_buffer[:size])
+            del self.recv_buffer[:size]
         return ret
 
     async def select(self):
+        import websockets
         if len(self.recv_buffer) == 0:
-            self.recv_buffer += await self._websocket.recv()
+            try:
+                frame = await self._websocket.recv()
+            except websockets.ConnectionClosed:
+                # Readable with nothing to read, as a closed socket reports it
+                return 1, None, None
+            self.recv_buffer += frame.encode() if isinstance(frame, str) else frame
         return len(self.recv_buffer), None, None
 
 async def aio_sock_open(sock, host, port):
@@ -64,6 +76,8 @@ class aio_sock:
         self.host = host
 
         self.socket = socket.socket() if sys.platform == "emscripten" else WebsocketWrapper()
+        self.outq = deque()
+        self.sender = None
 
         print(f"host={host} port={port} mode={mode} tmout={tmout}")
 
@@ -81,7 +95,8 @@ class aio_sock:
         return self.socket.recv(size, t)
 
     async def __aenter__(self):
-        await aio_sock_open(self.socket, self.host, self.port)
+        if await aio_sock_open(self.socket, self.host, self.port) is None:
+            raise ConnectionError(f"cannot connect to {self.host}:{self.port}")
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
@@ -89,10 +104,21 @@ class aio_sock:
             await self.socket.close()
         del self.port, self.host, self.socket
 
-    def print(self, *argv, **kw):
-        kw["file"] = io.StringIO(newline="\r\n")
-        print(*argv, **kw)
-        asyncio.create_task(self.send(kw["file"].getvalue()))
+    def write_lines(self, lines):
+        """Sends lines as one frame. Frames go out in order through a single task."""
+        self.outq.append("".join(f"{line}\r\n" for line in lines))
+        if self.sender is None or self.sender.done():
+            self.sender = asyncio.create_task(self.drain())
+
+    async def drain(self):
+        while self.outq:
+            try:
+                await self.send(self.outq[0])
+            except Exception as e:
+                # The frame stays queued, the node sends it again after reconnecting
+                print("send failed:", e)
+                return
+            self.outq.popleft()
 
 
 class Node:
@@ -106,72 +132,158 @@ class Node:
     GLOBAL = "k"
     USERLIST = "l"
     JOINED = "m"
+    RECONNECTED = "n"
     B64JSON = "j64"
 
     host = "://pmp-p.ddns.net/wss/6667:443"
     lobby = "#pygbag"
 
-    events = []
+    # Outbound lines wait for flush(), at the end of a frame, and go out together: at most
+    # batch_limit bytes per frame, and no later than flush_delay seconds after the first was queued
+    batch_limit = 16 * 1024
+    flush_delay = 0.05
+    # Most bytes read from the socket at once
+    recv_size = 64 * 1024
+    # After a hangup or a failed attempt, wait reconnect_delay seconds, doubled for every further
+    # failure up to reconnect_max_delay, with jitter so peers of a dropped relay do not come back at once
+    reconnect_delay = 0.5
+    reconnect_max_delay = 30.0
+
+    # Game data codecs, preferred first. JSON is the fallback every peer reads
+    codecs = (BinaryCodec(), JsonCodec())
 
     def __init__(self, gid):
         self.aiosock = None
+        self.events = []
 
         self.gid = gid
         Node.lobby_channel = f"{Node.lobby}-{gid}"
         self.lobby_channel = Node.lobby_channel
 
         self.users = {}
-
-        self.rxq = []
-        self.txq = []
+        self.peer_codecs = {}
+        # Nick that sent the last B64JSON event
+        self.sender = None
+
+        self.rxq = deque()
+        self.txq = deque()
+        self.txq_bytes = 0
+        self.flush_handle = None
         self.alarm_set = 0
 
         self.current_channel = ""
+        # Set by the server's welcome; until then only the handshake goes out and txq waits
+        self.registered = False
+        self.sessions = 0
+        self.attempts = 0
 
-        asyncio.create_task(self.connect(Node.host))
+        asyncio.create_task(self.stay_connected(Node.host))
 
         stime = str(time.time())[-5:].replace(".", "")
         self.pid = int(stime)
         self.nick = f"u_{self.pid}"
 
+    async def stay_connected(self, host):
+        while True:
+            try:
+                await self.connect(host)
+            except ConnectionError as e:
+                print(e)
+            except Exception as e:
+                traceback.print_exception(e)
+            delay = min(self.reconnect_max_delay, self.reconnect_delay * 2 ** self.attempts)
+            delay = random.uniform(delay / 2, delay)
+            self.attempts += 1
+            print(f"reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def connected(self):
+        return self.aiosock is not None and self.registered
+
     async def connect(self, host):
-        self.peek = []
+        self.peek = bytearray()
         async with aio_sock(host, "a+", 5) as sock:
             self.host = host
-            self.events.append(self.CONNECTED)
+            self.events.append(self.RECONNECTED if self.sessions else self.CONNECTED)
+            self.sessions += 1
+            self.attempts = 0
             self.aiosock = sock
 
-            while True:
-                if sys.platform == 'emscripten':
-                    rr, rw, re = select.select([sock.socket], [], [], 0)
-                else:
-                    rr, rw, re = await sock.socket.select()
-                if rr or rw or re:
-                    while self.aiosock:
-                        try:
-                            one = await sock.recv(1, socket.MSG_DONTWAIT)
-                            if one:
-                                self.peek.append(one)
-                                if one == b"\n":
-                                    self.rxq.append(b"".join(self.peek))
-                                    self.peek.clear()
-                                    self.events.append(self.RX)
-                                    break
-                            else:
-                                # lost con.
-                                print("HANGUP", self.peek)
-                                self.aiosock = None
-                                print("TODO: ask for reconnect")
-                                return
-                        except BlockingIOError as e:
-                            if e.errno == 6:
-                                await asyncio.sleep(0)
-                else:
-                    await asyncio.sleep(0)
+            try:
+                while True:
+                    if sys.platform == 'emscripten':
+                        rr, rw, re = select.select([sock.socket], [], [], 0)
+                    else:
+                        rr, rw, re = await sock.socket.select()
+                    if not (rr or rw or re):
+                        await asyncio.sleep(0)
+                        continue
+
+                    try:
+                        chunk = await sock.recv(self.recv_size, socket.MSG_DONTWAIT)
+                    except BlockingIOError:
+                        await asyncio.sleep(0)
+                        continue
+                    if not chunk:
+                        # lost con.
+                        print("HANGUP", bytes(self.peek))
+                        return
+                    self.receive(chunk)
+            finally:
+                self.hangup(sock)
+
+    def hangup(self, sock):
+        """Ends the session. Frames it did not send go back to the front of txq for the next one."""
+        self.aiosock = None
+        if sock.sender is not None:
+            sock.sender.cancel()
+        # Before the welcome only the handshake was sent, the next session does its own
+        unsent = [frame[:-2] for frame in sock.outq] if self.registered else []
+        self.registered = False
+        sock.outq.clear()
+        self.txq.extendleft(reversed(unsent))
+        self.txq_bytes += sum(len(frame) + 2 for frame in unsent)
+        self.peek.clear()
+
+    def register(self):
+        """Sends the handshake. The lobby join and whatever was queued while disconnected wait for the welcome."""
+        self.registered = False
+        self.send_now("CAP LS", f"NICK {self.nick}", f"USER {self.nick} {self.nick} localhost :wsocket")
+
+    def welcome(self):
+        """The server accepted the nick: joins the lobby ahead of the queued lines and sends them."""
+        self.registered = True
+        line = f"JOIN {self.lobby_channel}"
+        self.txq.appendleft(line)
+        self.txq_bytes += len(line) + 2
+        self.flush()
+
+    def send_now(self, *lines):
+        """Sends lines ahead of txq, registered or not, for the handshake and keepalives."""
+        if self.aiosock and self.aiosock.socket:
+            self.aiosock.write_lines(lines)
+
+    def receive(self, chunk):
+        """Splits what arrived into lines on rxq; a partial line waits in peek for the rest."""
+        # Only the new bytes can hold a line end
+        searched = len(self.peek)
+        self.peek += chunk
+        end = self.peek.find(b"\n", searched)
+        if end < 0:
+            return
+
+        start = 0
+        view = memoryview(self.peek)
+        while end >= 0:
+            self.rxq.append(bytes(view[start:end + 1]))
+            start = end + 1
+            end = self.peek.find(b"\n", start)
+        view.release()
+        del self.peek[:start]
+        self.events.append(self.RX)
 
     def tx(self, obj):
-        ser = json.dumps(obj)
-        self.out(self.B64JSON + ":" + base64.b64encode(ser.encode("ascii")).decode("utf-8"))
+        self.out(self.B64JSON + ":" + JsonCodec().encode(obj))
 
     def join(self, channel):
         self.wire(f"JOIN {channel}")
@@ -180,18 +292,52 @@ class Node:
         self.wire(f"PRIVMSG {nick} :{data}")
 
     def privmsg_b64json(self, nick, data):
-        ser = json.dumps(data)
-        self.privmsg(nick, f"{self.B64JSON}:{base64.b64encode(ser.encode('ascii')).decode('utf-8')}")
+        self.privmsg(nick, f"{self.B64JSON}:{JsonCodec().encode(data)}")
+
+    def codec_names(self):
+        return [codec.name for codec in self.codecs]
+
+    def agree(self, nick, names):
+        """Picks the codec for messages to nick: the first of ours it listed, else JSON."""
+        self.peer_codecs[nick] = next((codec for codec in self.codecs if codec.name in names), JsonCodec())
+
+    def privmsg_encoded(self, nick, data):
+        codec = self.peer_codecs.get(nick) or JsonCodec()
+        self.privmsg(nick, f"{codec.prefix}:{codec.encode(data)}")
 
     def out(self, *blocks):
         self.privmsg(self.lobby_channel, ' '.join(map(str, blocks)))
 
-    # TODO: handle hangup/reconnect nicely (no flood)
     def wire(self, rawcmd):
+        """Queues a line for the next flush. Outside a running loop the line only waits in txq until then."""
         self.txq.append(rawcmd)
-        if self.aiosock and self.aiosock.socket:
-            while len(self.txq):
-                self.aiosock.print(self.txq.pop(0))
+        self.txq_bytes += len(rawcmd) + 2
+        if self.txq_bytes >= self.batch_limit:
+            self.flush()
+        elif self.flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self.flush_handle = loop.call_later(self.flush_delay, self.flush)
+
+    def flush(self):
+        """Sends the queued lines in frames of at most batch_limit bytes; they wait until registered."""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not (self.aiosock and self.aiosock.socket and self.registered):
+            return
+
+        while self.txq:
+            batch, size = [], 0
+            # A line longer than the limit goes alone
+            while self.txq and (not batch or size + len(self.txq[0]) + 2 <= self.batch_limit):
+                line = self.txq.popleft()
+                batch.append(line)
+                size += len(line) + 2
+            self.aiosock.write_lines(batch)
+        self.txq_bytes = 0
 
     def process_server(self, cmd, line):
         self.discarded = False
@@ -214,6 +360,13 @@ class Node:
             yield self.SPURIOUS
             return self.discard()
 
+        if cmd.find(" 433 ") > 0:
+            # After a reconnect the nick can still be held by the dropped session, until the server times it out.
+            # The welcome follows once a retry gets it, and lets the join and txq go
+            asyncio.get_running_loop().call_later(self.reconnect_max_delay / 10, self.send_now, f"NICK {self.nick}")
+            yield self.SPURIOUS
+            return self.discard()
+
         if cmd.find(" 366 ") > 0:
             yield self.USERLIST
             return self.discard()
@@ -232,6 +385,9 @@ class Node:
             yield self.PONG
             return self.discard()
 
+        if cmd.find(" 001 ") > 0:
+            self.welcome()
+
         for srv in "001 002 003 004 251 375 372 376".split(" "):
             if cmd.find(f" {srv} ") > 0:
                 self.proto = cmd
@@ -239,21 +395,22 @@ class Node:
                 yield self.GLOBAL
                 return self.discard()
 
-        if cmd.find("PING ") >= 0:
-            print("348: PING ?")
-            self.proto, self.data = cmd.strip().split(":", 1)
-            self.wire(line.replace("PING ", "PONG ", 1))
+        if cmd.find(" PING ") > 0:
+            self.proto, self.data = cmd.strip(), line
+            self.send_now(f"PONG :{line}")
             yield self.PING
             return self.discard()
 
     def process_game(self, cmd, line):
         self.discarded = False
 
-        if line.startswith(f"{Node.B64JSON}:"):
+        prefix, _, data = line.partition(":")
+        codec = next((codec for codec in self.codecs if codec.prefix == prefix), None)
+        if codec is not None:
             try:
-                _, data = line.split(":", 1)
-                data = base64.b64decode(data.encode())
-                self.data = json.loads(data.decode())
+                # Game data arrives as a B64JSON event whichever codec carried it
+                self.data = codec.decode(data)
+                self.sender = cmd.split("!", 1)[0]
                 yield self.B64JSON
                 return self.discard()
 
@@ -269,7 +426,15 @@ class Node:
 
             if ev == self.RX:
                 while len(self.rxq):
-                    srvdata = self.rxq.pop(0).decode("utf-8").strip().split(":", 2)
+                    line = self.rxq.popleft().decode("utf-8").strip()
+                    if line.startswith("PING "):
+                        # Keepalive from the server itself, which has no prefix
+                        self.proto, self.data = "PING", line[5:]
+                        self.send_now(f"PONG {self.data}")
+                        yield self.PING
+                        continue
+
+                    srvdata = line.split(":", 2)
                     noise = srvdata.pop(0)
                     if noise:
                         print(f"364: server {noise=} on rxq, remaining {srvdata=}")
@@ -287,9 +452,8 @@ class Node:
                         yield self.RAW
                 continue
 
-            if ev == self.CONNECTED:
-                self.wire(f"CAP LS\r\nNICK {self.nick}\r\nUSER {self.nick} {self.nick} localhost :wsocket")
-                self.join(self.lobby_channel)
+            if ev in (self.CONNECTED, self.RECONNECTED):
+                self.register()
             else:
                 print(f"402:? {ev=} {self.rxq=}")
 
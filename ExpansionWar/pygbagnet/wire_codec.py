@@ -0,0 +1,290 @@
+import base64
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+
+class JsonCodec:
+    """The original format, JSON in base64. Every peer reads it, so it is the fallback."""
+
+    name = "json"
+    prefix = "j64"
+
+    def encode(self, data) -> str:
+        return base64.b64encode(json.dumps(data).encode("ascii")).decode("utf-8")
+
+    def decode(self, text: str):
+        return json.loads(base64.b64decode(text.encode()).decode())
+
+
+class BinaryCodec:
+    """
+    Tagged binary encoding, in base64 to fit an IRC line.
+
+    Known keys and strings (message types, actions) become small integers and integers are varints.
+    Lists of numbers are packed arrays of the narrowest type that fits. Lists of equal length rows
+    (rockets, connections, colours) and of dicts with the same keys (keyframe planets) go column by
+    column, so each column packs too, and columns of names become a name table and indices. Payloads
+    over COMPRESS_MIN bytes are zlib compressed when that makes them smaller. Decoding gives what
+    JSON would: tuples come back as lists.
+
+    The tables are part of the format, changing them needs a new name.
+    """
+
+    name = "bin1"
+    prefix = "b64"
+
+    COMPRESS_MIN = 256
+    COMPRESSED = 1
+
+    KEYS = ['type', 'message', 'action', 'request', 'version', 'base', 'clock', 'ticks', 'year', 'turn_color',
+            'turn_start', 'rockets_now', 'colors', 'planets', 'connections', 'rockets', 'fields', 'p1color', 'p2color',
+            'year_start', 'level', 'owner', 'value', 'value_start', 'add_value_every', 'send_rocket_every',
+            'rocket_upgrade', 'satellite_upgrade', 'planet_index', 'card', 'source_index', 'target_index',
+            'connection_index', 'resync', 'nick', 'offer', 'id', 'lobby_name', 'codecs', 'x', 'y', 'color', 'radius',
+            'base_texture_name', 'noise_texture_name', 'light_texture_name']
+    STRINGS = ['message', 'offer', 'join', 'keyframe', 'delta', 'state_ack', 'card_dropped', 'connection_created',
+               'connection_deleted', 'json', 'bin1']
+
+    (NONE, FALSE, TRUE, INT, FLOAT, WHOLE_FLOAT, STR, KNOWN_STR, LIST, INT_LIST, FLOAT_LIST, TABLE, DICT,
+     RECORDS, NAMES) = range(15)
+    # Array typecodes for INT_LIST, narrowest first, with the range each holds
+    INT_TYPES = [(code, -(1 << (8 * array(code).itemsize - 1)), (1 << (8 * array(code).itemsize - 1)) - 1)
+                 for code in "bhiq"]
+
+    def __init__(self):
+        self.key_ids = {key: i + 1 for i, key in enumerate(BinaryCodec.KEYS)}
+        self.string_ids = {string: i for i, string in enumerate(BinaryCodec.STRINGS)}
+
+    def encode(self, data) -> str:
+        out = bytearray()
+        self.write(out, data)
+        flags = 0
+        if len(out) > BinaryCodec.COMPRESS_MIN:
+            compressed = zlib.compress(out)
+            if len(compressed) < len(out):
+                out, flags = compressed, BinaryCodec.COMPRESSED
+        return base64.b64encode(bytes([flags]) + out).decode("ascii")
+
+    def decode(self, text: str):
+        raw = base64.b64decode(text.encode("ascii"))
+        body = memoryview(raw)[1:]
+        if raw[0] & BinaryCodec.COMPRESSED:
+            body = memoryview(zlib.decompress(body))
+        value, _ = self.read(body, 0)
+        return value
+
+    # Encoding
+
+    @staticmethod
+    def write_varint(out: bytearray, n: int):
+        while n >= 0x80:
+            out.append((n & 0x7f) | 0x80)
+            n >>= 7
+        out.append(n)
+
+    @staticmethod
+    def write_signed(out: bytearray, n: int):
+        BinaryCodec.write_varint(out, n * 2 if n >= 0 else -n * 2 - 1)
+
+    @staticmethod
+    def write_str(out: bytearray, text: str):
+        encoded = text.encode("utf-8")
+        BinaryCodec.write_varint(out, len(encoded))
+        out += encoded
+
+    def write_key(self, out: bytearray, key: str):
+        if key in self.key_ids:
+            BinaryCodec.write_varint(out, self.key_ids[key])
+        else:
+            out.append(0)
+            BinaryCodec.write_str(out, key)
+
+    def write(self, out: bytearray, value):
+        if value is None:
+            out.append(BinaryCodec.NONE)
+        elif value is True or value is False:
+            out.append(BinaryCodec.TRUE if value else BinaryCodec.FALSE)
+        elif isinstance(value, int):
+            out.append(BinaryCodec.INT)
+            BinaryCodec.write_signed(out, value)
+        elif isinstance(value, float):
+            # Game clocks and sizes are mostly whole numbers, which are shorter as varints
+            if value.is_integer() and abs(value) < 2 ** 53:
+                out.append(BinaryCodec.WHOLE_FLOAT)
+                BinaryCodec.write_signed(out, int(value))
+            else:
+                out.append(BinaryCodec.FLOAT)
+                out += struct.pack("<d", value)
+        elif isinstance(value, str):
+            if value in self.string_ids:
+                out.append(BinaryCodec.KNOWN_STR)
+                BinaryCodec.write_varint(out, self.string_ids[value])
+            else:
+                out.append(BinaryCodec.STR)
+                BinaryCodec.write_str(out, value)
+        elif isinstance(value, (list, tuple)):
+            self.write_list(out, value)
+        elif isinstance(value, dict):
+            out.append(BinaryCodec.DICT)
+            BinaryCodec.write_varint(out, len(value))
+            for key, item in value.items():
+                self.write_key(out, key)
+                self.write(out, item)
+        else:
+            raise TypeError(f"Cannot encode {type(value)}")
+
+    def write_list(self, out: bytearray, value):
+        types = set(map(type, value))
+        if types == {int}:
+            if self.write_ints(out, value):
+                return
+        elif types == {float}:
+            out.append(BinaryCodec.FLOAT_LIST)
+            BinaryCodec.write_array(out, array("d", value))
+            return
+        elif len(value) > 1 and types <= {str, type(None)} and len(names := list(dict.fromkeys(value))) < len(value):
+            out.append(BinaryCodec.NAMES)
+            self.write_list(out, names)
+            self.write_list(out, list(map({name: i for i, name in enumerate(names)}.__getitem__, value)))
+            return
+        elif (len(value) > 1 and types <= {list, tuple} and 0 < len(value[0]) < len(value)
+              and len(set(map(len, value))) == 1):
+            out.append(BinaryCodec.TABLE)
+            BinaryCodec.write_varint(out, len(value[0]))
+            for column in zip(*value):
+                self.write_list(out, column)
+            return
+        elif len(value) > 1 and types == {dict} and len(value[0]) > 0 and len(set(map(tuple, value))) == 1:
+            out.append(BinaryCodec.RECORDS)
+            BinaryCodec.write_varint(out, len(value[0]))
+            for key in value[0]:
+                self.write_key(out, key)
+                self.write_list(out, [record[key] for record in value])
+            return
+
+        out.append(BinaryCodec.LIST)
+        BinaryCodec.write_varint(out, len(value))
+        for item in value:
+            self.write(out, item)
+
+    def write_ints(self, out: bytearray, values) -> bool:
+        """Writes values as the narrowest array that holds them; False if none does."""
+        low, high = min(values), max(values)
+        for code, least, most in BinaryCodec.INT_TYPES:
+            if least <= low and high <= most:
+                out.append(BinaryCodec.INT_LIST)
+                out += code.encode("ascii")
+                BinaryCodec.write_array(out, array(code, values))
+                return True
+        return False
+
+    @staticmethod
+    def write_array(out: bytearray, values: array):
+        if sys.byteorder == "big":
+            values.byteswap()
+        BinaryCodec.write_varint(out, len(values))
+        out += values.tobytes()
+
+    # Decoding
+
+    @staticmethod
+    def read_varint(data: memoryview, at: int) -> (int, int):
+        n = shift = 0
+        while True:
+            byte = data[at]
+            at += 1
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return n, at
+            shift += 7
+
+    @staticmethod
+    def read_signed(data: memoryview, at: int) -> (int, int):
+        n, at = BinaryCodec.read_varint(data, at)
+        return (n >> 1) if not n & 1 else -((n + 1) >> 1), at
+
+    @staticmethod
+    def read_str(data: memoryview, at: int) -> (str, int):
+        length, at = BinaryCodec.read_varint(data, at)
+        return bytes(data[at:at + length]).decode("utf-8"), at + length
+
+    @staticmethod
+    def read_key(data: memoryview, at: int) -> (str, int):
+        key_id, at = BinaryCodec.read_varint(data, at)
+        if key_id:
+            return BinaryCodec.KEYS[key_id - 1], at
+        return BinaryCodec.read_str(data, at)
+
+    @staticmethod
+    def read_array(data: memoryview, at: int, code: str) -> (list, int):
+        count, at = BinaryCodec.read_varint(data, at)
+        values = array(code)
+        end = at + count * values.itemsize
+        values.frombytes(data[at:end])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values.tolist(), end
+
+    def read(self, data: memoryview, at: int):
+        tag = data[at]
+        at += 1
+        if tag == BinaryCodec.NONE:
+            return None, at
+        if tag == BinaryCodec.FALSE:
+            return False, at
+        if tag == BinaryCodec.TRUE:
+            return True, at
+        if tag == BinaryCodec.INT:
+            return BinaryCodec.read_signed(data, at)
+        if tag == BinaryCodec.WHOLE_FLOAT:
+            n, at = BinaryCodec.read_signed(data, at)
+            return float(n), at
+        if tag == BinaryCodec.FLOAT:
+            return struct.unpack_from("<d", data, at)[0], at + 8
+        if tag == BinaryCodec.STR:
+            return BinaryCodec.read_str(data, at)
+        if tag == BinaryCodec.KNOWN_STR:
+            i, at = BinaryCodec.read_varint(data, at)
+            return BinaryCodec.STRINGS[i], at
+        if tag == BinaryCodec.LIST:
+            count, at = BinaryCodec.read_varint(data, at)
+            items = []
+            for _ in range(count):
+                item, at = self.read(data, at)
+                items.append(item)
+            return items, at
+        if tag == BinaryCodec.INT_LIST:
+            return BinaryCodec.read_array(data, at + 1, chr(data[at]))
+        if tag == BinaryCodec.FLOAT_LIST:
+            return BinaryCodec.read_array(data, at, "d")
+        if tag == BinaryCodec.NAMES:
+            names, at = self.read(data, at)
+            indices, at = self.read(data, at)
+            return list(map(names.__getitem__, indices)), at
+        if tag == BinaryCodec.TABLE:
+            width, at = BinaryCodec.read_varint(data, at)
+            columns = []
+            for _ in range(width):
+                column, at = self.read(data, at)
+                columns.append(column)
+            return list(map(list, zip(*columns))), at
+        if tag == BinaryCodec.DICT:
+            count, at = BinaryCodec.read_varint(data, at)
+            items = {}
+            for _ in range(count):
+                key, at = BinaryCodec.read_key(data, at)
+                items[key], at = self.read(data, at)
+            return items, at
+        if tag == BinaryCodec.RECORDS:
+            width, at = BinaryCodec.read_varint(data, at)
+            keys, columns = [], []
+            for _ in range(width):
+                key, at = BinaryCodec.read_key(data, at)
+                column, at = self.read(data, at)
+                keys.append(key)
+                columns.append(column)
+            return [dict(zip(keys, row)) for row in zip(*columns)], at
+        raise ValueError(f"Unknown tag {tag} at {at - 1}")
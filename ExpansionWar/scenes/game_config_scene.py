@@ -21,8 +21,8 @@ class GameConfigScene:
         self.background.set_alpha(200)
 
         # Font setup
-        self.title_font = pygame.font.Font(config.assets[config.FONT_NAME], 65)
-        self.ui_font = pygame.font.Font(config.assets[config.FONT_NAME], 60)
+        self.title_font = config.resources.font(config.FONT_NAME, 65)
+        self.ui_font = config.resources.font(config.FONT_NAME, 60)
 
         # Mode selection buttons
         self.mode_buttons = [
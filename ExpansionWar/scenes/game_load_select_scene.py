@@ -19,8 +19,8 @@ class GameLoadSelectScene:
         self.background.set_alpha(200)
 
         # Font setup
-        self.title_font = pygame.font.Font(config.assets[config.FONT_NAME], 100)
-        self.file_font = pygame.font.Font(config.assets[config.FONT_NAME], 50)
+        self.title_font = config.resources.font(config.FONT_NAME, 100)
+        self.file_font = config.resources.font(config.FONT_NAME, 50)
 
         self.back_text = self.file_font.render("Back", True, (0, 0, 0))
         button_width, button_height = 350, 90
@@ -5,7 +5,11 @@ import pygame
 
 import config
 from entities.card import Card
+from entities.rocket import Rocket
+from managers.dirty_rect_renderer import DirtyRectRenderer
+from managers.frame_profiler import FrameProfiler
 from managers.game_manager import GameManager, GameMode
+from managers.layer_compositor import LayerCompositor
 
 logger = logging.getLogger(__name__)
 
@@ -22,21 +26,21 @@ class GameScene:
         self.info_bar_surface = pygame.Surface((config.SCREEN_WIDTH, config.GAME_INFO_BAR_HEIGHT))
         self.info_bar_surface.set_alpha(200)
         self.info_bar_surface.fill((0, 0, 0))
-        self.info_bar_font = pygame.font.Font(config.assets[config.FONT_NAME], 48)
+        self.info_bar_font = config.resources.font(config.FONT_NAME, 48)
 
         self.cards_surface = pygame.Surface((config.SCREEN_WIDTH, config.CARDS_BAR_HEIGHT))
         self.cards_surface.set_alpha(200)
         self.cards_surface.fill((0, 0, 0))
 
-        self.save_button_img = pygame.image.load(config.assets["save.png"])
+        self.save_button_img = config.resources.image("save.png")
         btn_width = self.save_button_img.get_width()
         btn_x = (config.SCREEN_WIDTH - btn_width) // 2
         btn_y = (config.GAME_INFO_BAR_HEIGHT - self.save_button_img.get_height()) // 2
         self.save_btn_rect = pygame.Rect(btn_x, btn_y, btn_width, self.save_button_img.get_height())
 
         self.cards = []
-        self.cards.append(Card(config.CARDS_BAR_HEIGHT * 3 / 4 * 3 / 4, config.CARDS_BAR_HEIGHT * 3 / 4, pygame.image.load(config.assets["satellite.png"]), 10))
-        self.cards.append(Card(config.CARDS_BAR_HEIGHT * 3 / 4 * 3 / 4, config.CARDS_BAR_HEIGHT * 3 / 4, pygame.image.load(config.assets["Rockets/spaceRockets_002.png"]), 5))
+        self.cards.append(Card(config.CARDS_BAR_HEIGHT * 3 / 4 * 3 / 4, config.CARDS_BAR_HEIGHT * 3 / 4, config.resources.image("satellite.png"), 10))
+        self.cards.append(Card(config.CARDS_BAR_HEIGHT * 3 / 4 * 3 / 4, config.CARDS_BAR_HEIGHT * 3 / 4, config.resources.image("Rockets/spaceRockets_002.png"), 5))
 
         self.card_rects = self.get_card_rects()
 
@@ -44,17 +48,110 @@ class GameScene:
         self.dragging_card_offset = (0, 0)
         self.dragging_card_pos = (0, 0)
 
-    def draw(self, surface):
+        self.compositor = LayerCompositor()
+        self.renderer = DirtyRectRenderer()
+        self.rendered_data = None
+
+    def draw(self, surface, background = None):
+        """Without a background the HUD is drawn over whatever is on surface; with one, the frame starts from the cached static layer."""
+        profiler = FrameProfiler.Instance
+        profiler.mark("scene")
         self.manager.tick()
+        profiler.mark("game tick")
 
         if self.manager.data is None:
+            if background is not None:
+                surface.blit(background, (0, 0))
             return
 
+        if background is None:
+            self.draw_static_layers(surface)
+        else:
+            surface.blit(self.static_layer(background), (0, 0))
+
+        self.draw_turn(surface)
+
+        self.update_black_surfaces()
+        profiler.mark("scene")
+
+        for connection in self.manager.data.connections:
+            connection.draw(self.planets_base_x, self.planets_base_y, surface)
+        profiler.mark("connections")
+
+        Rocket.draw_all(self.manager.data.rocket_state, self.planets_base_x, self.planets_base_y, surface)
+        profiler.mark("rockets")
+
+        for planet in self.manager.data.planets:
+            planet.draw(surface, self.planets_base_x, self.planets_base_y, self.manager.data.current_ticks)
+        profiler.mark("planets")
+
+        if self.dragging_card is not None:
+            self.cards[self.dragging_card].draw(surface, self.dragging_card_pos[0], self.dragging_card_pos[1])
+
+    def draw_dirty(self, surface, background, full = False):
+        """Draws only what changed since the last frame over background and returns the rects to update."""
+        FrameProfiler.Instance.mark("scene")
+        self.manager.tick()
+        FrameProfiler.Instance.mark("game tick")
+
+        if self.manager.data is None:
+            return []
+
+        # Items are keyed by planet index and rocket sequence, which restart with every GameData
+        if full or self.rendered_data is not self.manager.data:
+            self.renderer.invalidate()
+            self.rendered_data = self.manager.data
+
+        self.update_black_surfaces()
+        return self.renderer.render(surface, self.static_layer(background), self.frame_items())
+
+    def static_layer(self, background):
+        """Background with the info bar and card bar blended in, rebuilt only when one of them changes."""
+        data = self.manager.data
+        return self.compositor.get(background, (data.level, data.year, data.current_turn_color, self.dragging_card), self.draw_static_layers)
+
+    def draw_static_layers(self, surface):
         surface.blit(self.info_bar_surface, (0,0))
+        self.draw_info(surface)
+        self.draw_cards_bar(surface)
+
+    def frame_items(self):
+        """The frame as (key, rect, signature, draw, args) items in painter's order, for DirtyRectRenderer."""
+        data = self.manager.data
+        # The info bar and card bar are part of the static layer the renderer restores from
+        items = [
+            ('turn', pygame.Rect(self.planets_base_x, self.planets_base_y, config.SCREEN_WIDTH, 10),
+             (data.current_turn_color, int(self.turn_bar_width())), self.draw_turn, ()),
+        ]
+
+        for connection in data.connections:
+            items.append((('connection', connection.id), connection.bounds(self.planets_base_x, self.planets_base_y),
+                          connection.render_signature(), self.draw_connection, (connection,)))
+
+        for sequence, rocket_texture, rect in Rocket.sprites_in_flight(data.rocket_state, self.planets_base_x, self.planets_base_y):
+            items.append((('rocket', sequence), rect, id(rocket_texture), pygame.Surface.blit, (rocket_texture, rect)))
+
+        for planet in data.planets:
+            items.append((('planet', planet.index), planet.bounds(self.planets_base_x, self.planets_base_y),
+                          planet.render_signature(data.current_ticks), self.draw_planet, (planet,)))
+
+        if self.dragging_card is not None:
+            card = self.cards[self.dragging_card]
+            items.append(('dragging card', card.card_surface.get_rect(topleft=self.dragging_card_pos), self.dragging_card,
+                          card.draw, self.dragging_card_pos))
+
+        return items
+
+    def draw_connection(self, surface, connection):
+        connection.draw(self.planets_base_x, self.planets_base_y, surface)
+
+    def draw_planet(self, surface, planet):
+        planet.draw(surface, self.planets_base_x, self.planets_base_y, self.manager.data.current_ticks)
+
+    def draw_cards_bar(self, surface):
         if self.manager.data.current_turn_color in (self.manager.data.p1color, self.manager.data.p2color):
             surface.blit(self.cards_surface, (0, self.planets_base_y + config.GAME_SCENE_HEIGHT))
 
-        self.draw_info(surface)
         self.draw_cards(surface)
 
         if self.manager.game_mode == GameMode.LOCAL_TWO_PLAYER and (
@@ -62,16 +159,14 @@ class GameScene:
         ) or self.manager.data.current_turn_color != self.manager.data.p1color:
             surface.blit(self.cards_surface, (0, self.planets_base_y + config.GAME_SCENE_HEIGHT))
 
-        self.draw_turn(surface)
-
-        for connection in self.manager.data.connections:
-            connection.draw(self.planets_base_x, self.planets_base_y, surface, self.manager.data.current_ticks)
-
+    def update_black_surfaces(self):
         for planet in self.manager.data.planets:
-            planet.draw(surface, self.planets_base_x, self.planets_base_y, self.manager.data.current_ticks)
-
-        if self.dragging_card is not None:
-            self.cards[self.dragging_card].draw(surface, self.dragging_card_pos[0], self.dragging_card_pos[1])
+            if self.dragging_card == 0:
+                planet.apply_black_surface = not (
+                        planet.color == self.manager.data.current_turn_color and planet.value > config.SATELLITE_COST)
+            elif self.dragging_card == 1:
+                planet.apply_black_surface = not (
+                        planet.color == self.manager.data.current_turn_color and planet.value > config.ROCKET_COST)
 
     def draw_info(self, surface):
         y = (config.GAME_INFO_BAR_HEIGHT - self.info_bar_font.get_linesize()) / 2
@@ -92,12 +187,16 @@ class GameScene:
                 continue
             card.draw(surface, self.card_rects[i].x, self.card_rects[i].y)
 
+    def turn_bar_width(self):
+        return config.lerp(0, config.TURN_TIME, config.SCREEN_WIDTH, 0, self.manager.data.current_ticks - self.manager.data.current_turn_start)
+
     def draw_turn(self, surface):
-        x = config.lerp(0, config.TURN_TIME, config.SCREEN_WIDTH, 0, self.manager.data.current_ticks - self.manager.data.current_turn_start)
+        x = self.turn_bar_width()
         pygame.draw.rect(surface, self.manager.data.current_turn_color, (self.planets_base_x, self.planets_base_y, x, 10))
 
     def handle_click(self, pos):
-        for planet in self.manager.data.planets:
+        board_x, board_y = pos[0] - self.planets_base_x, pos[1] - self.planets_base_y
+        for planet in self.manager.data.planets_at(board_x, board_y):
             if planet.is_clicked(self.planets_base_x, self.planets_base_y, pos):
                 logger.debug(f"Planet {planet} clicked")
                 if self.selected_planet is None:
@@ -122,7 +221,7 @@ class GameScene:
                     planet.selected = True
                     return True
                 elif self.selected_planet != planet:
-                    if planet in [connection.other_planet for connection in self.manager.data.connections if connection.planet == self.selected_planet]:
+                    if self.manager.data.is_connected(self.selected_planet, planet):
                         logger.warning("Planets already connected!")
                     else:
                         logger.info("Connected planets")
@@ -136,7 +235,7 @@ class GameScene:
                     self.selected_planet = None
                     return True
 
-        for connection in self.manager.data.connections:
+        for connection in self.manager.data.connections_at(board_x, board_y):
             if connection.is_clicked(self.planets_base_x, self.planets_base_y, pos):
                 logger.debug(f"Connection {connection} clicked")
                 if self.manager.game_mode == GameMode.LOCAL_TWO_PLAYER:
@@ -180,7 +279,7 @@ class GameScene:
 
     def handle_mouse_up(self, pos):
         if self.dragging_card is not None:
-            for planet in self.manager.data.planets:
+            for planet in self.manager.data.planets_at(pos[0] - self.planets_base_x, pos[1] - self.planets_base_y):
                 if planet.is_clicked(self.planets_base_x, self.planets_base_y, pos):
                     self.manager.card_dropped(self.dragging_card, planet)
 
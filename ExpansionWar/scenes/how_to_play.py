@@ -6,9 +6,9 @@ from entities.planet import Planet
 
 class HowToPlayScene:
     def __init__(self):
-        self.title_font = pygame.font.Font(config.assets[config.FONT_NAME], 100)
-        self.text_font = pygame.font.Font(config.assets[config.FONT_NAME], 20)
-        self.button_font = pygame.font.Font(config.assets[config.FONT_NAME], 36)
+        self.title_font = config.resources.font(config.FONT_NAME, 100)
+        self.text_font = config.resources.font(config.FONT_NAME, 20)
+        self.button_font = config.resources.font(config.FONT_NAME, 36)
 
         self.title_text = self.title_font.render("How To Play", True, (255, 255, 255))
 
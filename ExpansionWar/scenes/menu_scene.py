@@ -7,9 +7,9 @@ from scenes.how_to_play import HowToPlayScene
 
 class MenuScene:
     def __init__(self):
-        self.title_font = pygame.font.Font(config.assets[config.FONT_NAME], 100)
-        self.button_font = pygame.font.Font(config.assets[config.FONT_NAME], 50)
-        self.link_font = pygame.font.Font(config.assets[config.FONT_NAME], 40)
+        self.title_font = config.resources.font(config.FONT_NAME, 100)
+        self.button_font = config.resources.font(config.FONT_NAME, 50)
+        self.link_font = config.resources.font(config.FONT_NAME, 40)
 
         # Render texts.
         self.title_text = self.title_font.render("Planet", True, (255, 255, 255))
@@ -30,7 +30,12 @@ class MenuScene:
     def draw(self, surface):
         screen_width, screen_height = surface.get_size()
 
-        self.planet.draw(surface, 0, 0, pygame.time.get_ticks())
+        # The menu planet is not simulated, so pulse its satellite rays here
+        ticks = pygame.time.get_ticks()
+        if ticks - self.planet.value_start > self.planet.add_value_every:
+            self.planet.value_start = ticks
+
+        self.planet.draw(surface, 0, 0, ticks)
 
         title_rect = self.title_text.get_rect(midtop=(screen_width // 2, 50))
         surface.blit(self.title_text, title_rect)
@@ -0,0 +1,69 @@
+import bisect
+
+import numpy as np
+
+
+class ColorTables:
+    """
+    Planets by owner id, kept up to date as owners change, so the enemy AI reads what a colour owns
+    and can target without scanning the board.
+
+    A capture touches two colours: only their cached arrays are dropped, and rebuilt when next read.
+    """
+
+    def __init__(self):
+        self.count = 0
+        # Sorted planet indices by owner id, and the owner ids present on the board, sorted
+        self.owned : {int: [int]} = {}
+        self.present : [int] = []
+
+        self.owned_arrays : {int: np.ndarray} = {}
+        self.target_arrays : {int: np.ndarray} = {}
+
+    def add(self, index: int, owner_id: int):
+        self.count = max(self.count, index + 1)
+        self.insert(index, owner_id)
+        # Every other colour gains a target
+        self.target_arrays.clear()
+
+    def move(self, index: int, old_id: int, new_id: int):
+        if old_id == new_id:
+            return
+        planets = self.owned[old_id]
+        del planets[bisect.bisect_left(planets, index)]
+        if not planets:
+            del self.owned[old_id]
+            self.present.remove(old_id)
+        self.owned_arrays.pop(old_id, None)
+        self.target_arrays.pop(old_id, None)
+        self.insert(index, new_id)
+
+    def insert(self, index: int, owner_id: int):
+        if owner_id not in self.owned:
+            self.owned[owner_id] = []
+            bisect.insort(self.present, owner_id)
+        bisect.insort(self.owned[owner_id], index)
+        self.owned_arrays.pop(owner_id, None)
+        self.target_arrays.pop(owner_id, None)
+
+    def owned_by(self, owner_id: int) -> np.ndarray:
+        """Indices of the planets owner_id owns, ascending."""
+        if owner_id not in self.owned_arrays:
+            self.owned_arrays[owner_id] = np.array(self.owned.get(owner_id, ()), dtype=np.int64)
+        return self.owned_arrays[owner_id]
+
+    def targets_of(self, owner_id: int) -> np.ndarray:
+        """Indices of the planets owner_id does not own, ascending."""
+        if owner_id not in self.target_arrays:
+            self.target_arrays[owner_id] = np.setdiff1d(np.arange(self.count, dtype=np.int64), self.owned_by(owner_id), assume_unique=True)
+        return self.target_arrays[owner_id]
+
+    def copy(self) -> 'ColorTables':
+        copy = ColorTables()
+        copy.count = self.count
+        copy.owned = {owner_id: list(planets) for owner_id, planets in self.owned.items()}
+        copy.present = list(self.present)
+        # Cached arrays are never written to, so they can be shared
+        copy.owned_arrays = dict(self.owned_arrays)
+        copy.target_arrays = dict(self.target_arrays)
+        return copy
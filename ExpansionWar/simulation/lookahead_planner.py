@@ -0,0 +1,231 @@
+import logging
+import time
+from collections import deque
+
+import numpy as np
+
+import config
+from data.game_data import GameData
+from entities.connection import Connection
+from simulation.planet_state import NO_OWNER_ID
+from simulation.simulation_engine import SimulationEngine
+
+logger = logging.getLogger(__name__)
+
+
+class LookaheadPlanner:
+    """
+    Enemy AI that scores candidate moves by playing each one ahead on a fork of the board.
+
+    A plan is a generator that yields after every rollout step. run() advances the queued plans until
+    its millisecond budget is spent, so a decision may take many frames but never makes one of them
+    long. Rollouts play on one fork of the board, kept for the planner's life: a plan snapshots the
+    real board when it starts, brings the fork to that snapshot and puts it back after every rollout.
+    The chosen move is checked again when it is played, since the real board kept changing meanwhile.
+
+    Moves are (kind, planet index, target index): CONNECT to a target, or SATELLITE / ROCKET upgrades
+    with no target.
+    """
+
+    # Plans
+    ATTACK = "attack"
+    TURN = "turn"
+
+    # Moves
+    CONNECT = "connect"
+    SATELLITE = "satellite"
+    ROCKET = "rocket"
+
+    def __init__(self, data: GameData):
+        self.data = data
+        self.board : GameData = data.fork()
+        self.queue : deque = deque()
+        self.planning : {((int, int, int), str)} = set()
+        self.rollouts = 0
+
+    def request(self, color: (int, int, int), plan: str):
+        """Queues a plan for color, unless one of the same kind is already queued."""
+        if (color, plan) in self.planning:
+            return
+        self.planning.add((color, plan))
+        self.queue.append((color, plan, self.plan(color, plan)))
+
+    def run(self, budget_ms: float = None) -> [((int, int, int), str, tuple)]:
+        """
+        Advances the queued plans for budget_ms, or to completion with None, and returns the finished
+        ones as (color, plan, move). move is None when nothing beat doing nothing.
+
+        A step only starts while the budget left covers what the step before it took, so a call runs over
+        by about one step at most. The first step always runs, or planning could stall.
+        """
+        started = time.perf_counter()
+        last_ms = 0.0
+        decisions = []
+        while self.queue:
+            step_started = time.perf_counter()
+            if budget_ms is not None and (step_started - started) * 1000 + last_ms > budget_ms:
+                break
+            color, plan, steps = self.queue[0]
+            try:
+                next(steps)
+            except StopIteration as finished:
+                self.queue.popleft()
+                self.planning.discard((color, plan))
+                decisions.append((color, plan, finished.value))
+            last_ms = (time.perf_counter() - step_started) * 1000
+        return decisions
+
+    # Planning
+
+    def plan(self, color: (int, int, int), plan: str):
+        root = self.data.snapshot()
+        if len(self.board.planets) != len(self.data.planets):
+            self.board = self.data.fork()
+        yield
+
+        self.board.restore(root)
+        yield
+
+        # Restoring from a snapshot of the fork itself is much cheaper than from one of the real board
+        root = self.board.snapshot()
+        yield
+
+        moves = self.upgrade_moves(self.board, color) if plan == LookaheadPlanner.TURN else self.attack_moves(self.board, color)
+        if not moves:
+            return None
+        yield
+
+        best, best_score = None, (yield from self.rollout(root, color, None))
+        for move in moves:
+            score = yield from self.rollout(root, color, move)
+            if score > best_score:
+                best, best_score = move, score
+        return best
+
+    def rollout(self, root: GameData, color: (int, int, int), move: tuple):
+        """Plays move ahead on the board, which starts and is left at root's state, and scores it."""
+        board = self.board
+        if move is not None:
+            LookaheadPlanner.play(board, color, move, warm=False)
+        yield
+
+        engine = SimulationEngine(board, enemy_ai=False)
+        step_ms = LookaheadPlanner.step_ms(board)
+        end = board.current_ticks + config.AI_LOOKAHEAD_HORIZON_MS
+        while board.current_ticks < end and engine.winner is None:
+            yield from engine.fixed_step_parts(step_ms)
+            yield
+
+        self.rollouts += 1
+        score = LookaheadPlanner.score(board, color)
+        yield
+
+        board.restore(root)
+        return score
+
+    @staticmethod
+    def step_ms(data: GameData) -> int:
+        """Rollout step: shorter on boards with many connections and rockets, so each one stays small."""
+        rockets = data.rocket_state
+        load = len(data.connections) + len(rockets.active) - len(rockets.free)
+        return max(config.SIMULATION_STEP_MS, config.AI_LOOKAHEAD_STEP_MS * config.AI_LOOKAHEAD_STEP_LOAD // max(load, config.AI_LOOKAHEAD_STEP_LOAD))
+
+    @staticmethod
+    def attack_moves(data: GameData, color: (int, int, int)) -> [tuple]:
+        """Connections from color's planets to the closest, weakest planets it does not own yet."""
+        state = data.planet_state
+        own_id = state.color_id(color)
+        sources = state.tables.owned_by(own_id)
+        targets = state.tables.targets_of(own_id)
+        if len(sources) == 0 or len(targets) == 0:
+            return []
+
+        cx = state.x[:state.count] + state.radius[:state.count]
+        cy = state.y[:state.count] + state.radius[:state.count]
+        distance = np.hypot(cx[sources][:, None] - cx[targets][None, :], cy[sources][:, None] - cy[targets][None, :])
+        # A target is as hard as its value, and harder the longer the rockets fly
+        cost = (distance * (np.maximum(state.value[targets], 0) + 1)[None, :]).ravel()
+
+        # Only the cheapest pairs are sorted, in the order a stable sort of all of them gives; more are
+        # taken while too many of those are connected already
+        count = config.AI_LOOKAHEAD_CANDIDATES * 4
+        while True:
+            cheapest = np.flatnonzero(cost <= np.partition(cost, count - 1)[count - 1]) if count < len(cost) else np.arange(len(cost))
+            moves = []
+            for flat in cheapest[np.argsort(cost[cheapest], kind='stable')].tolist():
+                source, target = sources[flat // len(targets)].item(), targets[flat % len(targets)].item()
+                if (source, target) in data.edges or (target, source) in data.edges:
+                    continue
+                moves.append((LookaheadPlanner.CONNECT, source, target))
+                if len(moves) == config.AI_LOOKAHEAD_CANDIDATES:
+                    return moves
+            if len(cheapest) == len(cost):
+                return moves
+            count *= 4
+
+    @staticmethod
+    def upgrade_moves(data: GameData, color: (int, int, int)) -> [tuple]:
+        """Upgrades color can afford on its highest valued planets."""
+        state = data.planet_state
+        owned = state.tables.owned_by(state.color_id(color))
+        richest = owned[np.argsort(-state.value[owned], kind='stable')].tolist()
+
+        moves = []
+        for index in richest[:config.AI_LOOKAHEAD_CANDIDATES // 2]:
+            for kind in (LookaheadPlanner.SATELLITE, LookaheadPlanner.ROCKET):
+                if LookaheadPlanner.is_legal(data, color, (kind, index, None)):
+                    moves.append((kind, index, None))
+        return moves
+
+    @staticmethod
+    def score(data: GameData, color: (int, int, int)) -> float:
+        """Strength of color minus that of its strongest opponent; upgrades count at what they cost."""
+        state = data.planet_state
+        count = state.count
+        worth = (state.value[:count] + config.AI_PLANET_WORTH
+                 + state.satellite_upgrade[:count] * config.SATELLITE_COST
+                 + (state.rocket_upgrade[:count] - 1) * config.ROCKET_COST)
+        strength = np.bincount(state.owners(), weights=worth, minlength=len(state.colors))
+
+        rockets = data.rocket_state
+        active = np.flatnonzero(rockets.active)
+        strength += np.bincount(state.owner[rockets.source[active]], weights=rockets.payload[active], minlength=len(state.colors))
+
+        own_id = state.color_ids.get(tuple(color))
+        if own_id is None:
+            return -np.inf
+        opponents = np.delete(strength, [NO_OWNER_ID, own_id])
+        return strength[own_id] - (opponents.max() if len(opponents) else 0)
+
+    # Moves
+
+    @staticmethod
+    def is_legal(data: GameData, color: (int, int, int), move: tuple) -> bool:
+        kind, index, target = move
+        planet = data.planets[index]
+        if planet.color != tuple(color):
+            return False
+        if kind == LookaheadPlanner.CONNECT:
+            other = data.planets[target]
+            return other.color != tuple(color) and not data.are_linked(planet, other)
+        if kind == LookaheadPlanner.SATELLITE:
+            return planet.value > config.SATELLITE_COST and planet.satellite_upgrade < 6
+        return planet.value > config.ROCKET_COST and planet.rocket_upgrade < 4
+
+    @staticmethod
+    def play(data: GameData, color: (int, int, int), move: tuple, warm: bool = True) -> bool:
+        """Plays move for color on data; False if it is no longer legal there. Rollouts pass warm=False."""
+        if not LookaheadPlanner.is_legal(data, color, move):
+            return False
+
+        kind, index, target = move
+        planet = data.planets[index]
+        if kind == LookaheadPlanner.CONNECT:
+            data.add_connection(Connection(planet, data.planets[target], warm))
+        elif kind == LookaheadPlanner.SATELLITE:
+            planet.satellite_upgrade += 1
+            planet.value -= config.SATELLITE_COST
+        else:
+            planet.rocket_upgrade += 1
+            planet.value -= config.ROCKET_COST
+        return True
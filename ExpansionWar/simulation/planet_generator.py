@@ -0,0 +1,73 @@
+import math
+import random
+
+
+class PlanetGenerator:
+    """
+    Poisson-disk (Bridson) placement of planet positions in a rectangle.
+
+    Every pair of positions is at least min_distance apart. A background grid with one position per
+    cell keeps each check constant time, and each active position gets a bounded number of attempts,
+    so sampling always terminates in time linear in the number of positions that fit.
+    """
+
+    ATTEMPTS = 30
+
+    def __init__(self, x0: float, y0: float, x1: float, y1: float, min_distance: float, rng: random.Random):
+        self.x0, self.y0 = x0, y0
+        self.width = max(x1 - x0, 0)
+        self.height = max(y1 - y0, 0)
+        self.min_distance = min_distance
+        self.random = rng
+
+        self.cell_size = min_distance / math.sqrt(2)
+        self.columns = max(math.ceil(self.width / self.cell_size), 1)
+        self.rows = max(math.ceil(self.height / self.cell_size), 1)
+
+    def fill(self) -> [(float, float)]:
+        """Samples the rectangle until no more positions fit."""
+        grid = [None] * (self.columns * self.rows)
+        points = []
+        active = []
+
+        def cell(px, py):
+            return min(int(px / self.cell_size), self.columns - 1), min(int(py / self.cell_size), self.rows - 1)
+
+        def fits(px, py):
+            if not (0 <= px <= self.width and 0 <= py <= self.height):
+                return False
+            cx, cy = cell(px, py)
+            for nx in range(max(cx - 2, 0), min(cx + 3, self.columns)):
+                for ny in range(max(cy - 2, 0), min(cy + 3, self.rows)):
+                    other = grid[ny * self.columns + nx]
+                    if other is not None and math.hypot(other[0] - px, other[1] - py) < self.min_distance:
+                        return False
+            return True
+
+        def add(px, py):
+            cx, cy = cell(px, py)
+            grid[cy * self.columns + cx] = (px, py)
+            points.append((px, py))
+            active.append((px, py))
+
+        add(self.random.uniform(0, self.width), self.random.uniform(0, self.height))
+        while active:
+            i = self.random.randrange(len(active))
+            px, py = active[i]
+            for _ in range(PlanetGenerator.ATTEMPTS):
+                angle = self.random.uniform(0, 2 * math.pi)
+                distance = self.random.uniform(self.min_distance, 2 * self.min_distance)
+                qx, qy = px + distance * math.cos(angle), py + distance * math.sin(angle)
+                if fits(qx, qy):
+                    add(qx, qy)
+                    break
+            else:
+                active[i] = active[-1]
+                active.pop()
+
+        return [(self.x0 + px, self.y0 + py) for px, py in points]
+
+    def sample(self, count: int) -> [(float, float)]:
+        """Up to count positions spread over the whole rectangle; fewer means count does not fit."""
+        points = self.fill()
+        return self.random.sample(points, min(count, len(points)))
@@ -0,0 +1,119 @@
+import numpy as np
+
+import config
+from simulation.color_tables import ColorTables
+
+NO_OWNER_ID = 0
+
+
+class PlanetState:
+    """
+    Struct-of-arrays storage for planets. Planet objects are views of one row.
+
+    Colours are stored as small owner ids, colors[owner_id] gives the colour back. Owners are
+    written through set_owner, which keeps the per-colour tables in step.
+    """
+
+    FIELDS = {
+        'x': np.float64,
+        'y': np.float64,
+        'radius': np.float64,
+        'owner': np.int32,
+        'value': np.int64,
+        'value_start': np.int64,
+        'add_value_every': np.int64,
+        'send_rocket_every': np.int64,
+        'rocket_upgrade': np.int64,
+        'satellite_upgrade': np.int64,
+    }
+
+    def __init__(self, capacity: int = 16):
+        self.count = 0
+        for name, dtype in PlanetState.FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+        self.colors : [(int, int, int)] = [config.NO_OWNER_COLOR]
+        self.color_ids : dict = {config.NO_OWNER_COLOR: NO_OWNER_ID}
+        self.tables = ColorTables()
+
+    def color_id(self, color) -> int:
+        color = tuple(color)
+        if color not in self.color_ids:
+            self.color_ids[color] = len(self.colors)
+            self.colors.append(color)
+        return self.color_ids[color]
+
+    def add(self) -> int:
+        if self.count == len(self.x):
+            for name in PlanetState.FIELDS:
+                array = getattr(self, name)
+                grown = np.zeros(max(1, len(array) * 2), dtype=array.dtype)
+                grown[:self.count] = array[:self.count]
+                setattr(self, name, grown)
+
+        self.count += 1
+        self.tables.add(self.count - 1, self.owner[self.count - 1].item())
+        return self.count - 1
+
+    def adopt(self, other: 'PlanetState', other_index: int) -> int:
+        index = self.add()
+        for name in PlanetState.FIELDS:
+            if name != 'owner':
+                getattr(self, name)[index] = getattr(other, name)[other_index]
+        # Owner ids are per state
+        self.set_owner(index, self.color_id(other.colors[other.owner[other_index]]))
+        return index
+
+    def set_owner(self, index: int, owner_id: int):
+        self.tables.move(index, self.owner[index].item(), owner_id)
+        self.owner[index] = owner_id
+
+    def copy(self) -> 'PlanetState':
+        copy = PlanetState(len(self.x))
+        for name in PlanetState.FIELDS:
+            setattr(copy, name, getattr(self, name).copy())
+        copy.count = self.count
+        copy.colors = list(self.colors)
+        copy.color_ids = dict(self.color_ids)
+        copy.tables = self.tables.copy()
+        return copy
+
+    def restore(self, other: 'PlanetState'):
+        """Copies other, a copy of this state or of the one it was forked from, into the arrays this board's planets view."""
+        for name in PlanetState.FIELDS:
+            np.copyto(getattr(self, name), getattr(other, name))
+        self.count = other.count
+        self.colors = list(other.colors)
+        self.color_ids = dict(other.color_ids)
+        self.tables = other.tables.copy()
+
+    def owners(self) -> np.ndarray:
+        return self.owner[:self.count]
+
+    def present_colors(self) -> [(int, int, int)]:
+        return [self.colors[owner_id] for owner_id in self.tables.present]
+
+    def apply_income(self, current_ticks: int, due: np.ndarray) -> np.ndarray:
+        """Pays income to the owned planets among due and returns them; unowned planets earn nothing."""
+        paid = due[self.owner[due] != NO_OWNER_ID]
+        self.value_start[paid] = current_ticks
+        self.value[paid] += 1 + self.satellite_upgrade[paid]
+        return paid
+
+
+class StateField:
+    """Attribute of a Planet that lives in its PlanetState row."""
+
+    def __init__(self, cast):
+        self.cast = cast
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, planet, owner=None):
+        if planet is None:
+            return self
+        return self.cast(getattr(planet.state, self.name)[planet.index])
+
+    def __set__(self, planet, value):
+        getattr(planet.state, self.name)[planet.index] = value
@@ -0,0 +1,144 @@
+import numpy as np
+
+import config
+from simulation.planet_state import PlanetState
+from simulation.scheduler import Scheduler
+
+
+class RocketState:
+    """
+    Struct-of-arrays storage for every rocket in flight on the board.
+
+    Rows are slots: a finished rocket frees its slot for reuse, so a slot number stays valid for the
+    whole flight. active marks the slots that hold a rocket.
+
+    Rockets keep their start time on the state's own clock, now. Arrivals are timers in a Scheduler,
+    so advancing only touches the rockets that land.
+    """
+
+    FIELDS = {
+        'active': np.bool_,
+        'sequence': np.int64,
+        'connection': np.int64,
+        'source': np.int64,
+        'target': np.int64,
+        'start_x': np.float64,
+        'start_y': np.float64,
+        'end_x': np.float64,
+        'end_y': np.float64,
+        'heading': np.float64,
+        'start': np.float64,
+        'duration': np.float64,
+        'payload': np.int64,
+    }
+
+    def __init__(self, planet_state: PlanetState, capacity: int = 64):
+        self.planet_state = planet_state
+        for name, dtype in RocketState.FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+        self.free : [int] = list(range(capacity - 1, -1, -1))
+        self.next_sequence = 0
+
+        self.now = 0
+        self.arrivals = Scheduler()
+
+    def copy(self, planet_state: PlanetState) -> 'RocketState':
+        """Copy of every rocket in flight, launching from planet_state from now on."""
+        copy = RocketState(planet_state, 1)
+        for name in RocketState.FIELDS:
+            setattr(copy, name, getattr(self, name).copy())
+        copy.free = list(self.free)
+        copy.next_sequence = self.next_sequence
+        copy.now = self.now
+        copy.arrivals = self.arrivals.copy()
+        return copy
+
+    def restore(self, other: 'RocketState'):
+        """Makes this the same as other, a copy of this board's rockets or of its origin's, still launching from this planet_state."""
+        for name in RocketState.FIELDS:
+            array = getattr(other, name)
+            if len(getattr(self, name)) == len(array):
+                np.copyto(getattr(self, name), array)
+            else:
+                setattr(self, name, array.copy())
+        self.free = list(other.free)
+        self.next_sequence = other.next_sequence
+        self.now = other.now
+        self.arrivals = other.arrivals.copy()
+
+    def grow(self):
+        capacity = len(self.active)
+        for name in RocketState.FIELDS:
+            array = getattr(self, name)
+            grown = np.zeros(capacity * 2, dtype=array.dtype)
+            grown[:capacity] = array
+            setattr(self, name, grown)
+        self.free.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    def launch(self, connections: list) -> np.ndarray:
+        while len(self.free) < len(connections):
+            self.grow()
+
+        slots = np.array([self.free.pop() for _ in connections], dtype=np.int64)
+        sources = np.array([connection.planet.index for connection in connections], dtype=np.int64)
+        targets = np.array([connection.other_planet.index for connection in connections], dtype=np.int64)
+        planets = self.planet_state
+
+        self.active[slots] = True
+        self.sequence[slots] = np.arange(self.next_sequence, self.next_sequence + len(slots))
+        self.next_sequence += len(slots)
+        self.connection[slots] = [connection.id for connection in connections]
+        self.source[slots] = sources
+        self.target[slots] = targets
+        self.start_x[slots] = planets.x[sources] + planets.radius[sources]
+        self.start_y[slots] = planets.y[sources] + planets.radius[sources]
+        self.end_x[slots] = planets.x[targets] + planets.radius[targets]
+        self.end_y[slots] = planets.y[targets] + planets.radius[targets]
+        dx = self.end_x[slots] - self.start_x[slots]
+        dy = self.end_y[slots] - self.start_y[slots]
+        self.heading[slots] = -np.degrees(np.arctan2(dy, dx)) - 90
+        self.start[slots] = self.now
+        self.duration[slots] = np.hypot(dx, dy) / config.ROCKET_SPEED
+        self.payload[slots] = planets.rocket_upgrade[sources]
+        for slot in slots.tolist():
+            self.arrivals.schedule(slot, self.now + self.duration[slot])
+        return slots
+
+    def elapsed(self, slot: int) -> float:
+        return self.now - self.start[slot]
+
+    def set_elapsed(self, slot: int, elapsed: float):
+        self.start[slot] = self.now - elapsed
+        self.arrivals.schedule(slot, self.start[slot] + self.duration[slot])
+
+    def release(self, slots: np.ndarray):
+        self.active[slots] = False
+        for slot in slots.tolist():
+            self.arrivals.cancel(slot)
+        self.free.extend(int(slot) for slot in slots)
+
+    def advance(self, dt_ms: int) -> np.ndarray:
+        """Moves the clock forward and returns the slots that arrived, in launch order."""
+        self.now += dt_ms
+        arrived = np.array(self.arrivals.pop_due(self.now), dtype=np.int64)
+        if len(arrived) < 2:
+            return arrived
+        return arrived[np.argsort(self.sequence[arrived])]
+
+    def in_flight(self) -> np.ndarray:
+        active = np.flatnonzero(self.active)
+        return active[np.argsort(self.sequence[active])]
+
+    def of_connection(self, connection_id: int) -> np.ndarray:
+        active = np.flatnonzero(self.active & (self.connection == connection_id))
+        return active[np.argsort(self.sequence[active])]
+
+    def remove_connection(self, connection_id: int):
+        self.release(np.flatnonzero(self.active & (self.connection == connection_id)))
+
+    def positions(self, slots: np.ndarray) -> (np.ndarray, np.ndarray):
+        progress = np.minimum((self.now - self.start[slots]) / np.maximum(self.duration[slots], 1e-9), 1)
+        x = self.start_x[slots] + (self.end_x[slots] - self.start_x[slots]) * progress
+        y = self.start_y[slots] + (self.end_y[slots] - self.start_y[slots]) * progress
+        return x, y
@@ -0,0 +1,54 @@
+import heapq
+import itertools
+
+
+class Scheduler:
+    """
+    Priority queue of keyed timers.
+
+    A key has at most one pending time: scheduling it again moves it and cancel removes it. Stale heap
+    entries are skipped when they come up, so both are O(log n). Keys due at the same time come out
+    in the order they were scheduled.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.due = {}
+        self.counter = itertools.count()
+
+    def schedule(self, key, time):
+        self.due[key] = time
+        heapq.heappush(self.heap, (time, next(self.counter), key))
+
+    def copy(self, keys: dict = None) -> 'Scheduler':
+        """Copy with the same pending times and order; keys, if given, maps each pending key to its key in the copy."""
+        copy = Scheduler()
+        if keys is None:
+            # Stale entries are copied along, they are skipped the same way in the copy
+            copy.heap = list(self.heap)
+            copy.due = dict(self.due)
+        else:
+            copy.heap = [(time, order, keys[key]) for time, order, key in self.heap if self.due.get(key) == time]
+            heapq.heapify(copy.heap)
+            copy.due = {keys[key]: time for key, time in self.due.items()}
+        copy.counter = itertools.count(next(self.counter))
+        return copy
+
+    def cancel(self, key):
+        self.due.pop(key, None)
+
+    def pop_due(self, now, limit: int = None) -> list:
+        """Removes and returns every key due at or before now, or only the first limit of them."""
+        keys = []
+        while self.heap and self.heap[0][0] <= now and (limit is None or len(keys) < limit):
+            time, _, key = heapq.heappop(self.heap)
+            if self.due.get(key) == time:
+                del self.due[key]
+                keys.append(key)
+        return keys
+
+    def __contains__(self, key):
+        return key in self.due
+
+    def __len__(self):
+        return len(self.due)
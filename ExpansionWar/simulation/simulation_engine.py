@@ -0,0 +1,288 @@
+import logging
+import random
+
+import numpy as np
+
+import config
+from data.game_data import GameData
+from entities.connection import Connection
+
+logger = logging.getLogger(__name__)
+
+
+class SimulationEngine:
+    """
+    Runs the game rules on a GameData without touching pygame.
+
+    The engine advances in fixed steps of config.SIMULATION_STEP_MS, so the outcome does not depend
+    on the frame rate. Scenes only read the state it leaves in GameData.
+    """
+
+    def __init__(self, data: GameData, enemy_ai: bool = True, rng: random.Random = None, all_ai: bool = False,
+                 ai_budget_ms: float = config.AI_FRAME_BUDGET_MS, replica: bool = False, host_ai: bool = False):
+        self.data = data
+        self.enemy_ai = enemy_ai and not replica
+        # A replica's rules run on the host and arrive through a StateReplicator; it only moves the clocks on between updates
+        self.replica = replica
+        # With all_ai the players' colors are played by the enemy AI too, for headless AI-vs-AI matches
+        self.all_ai = all_ai
+        # With host_ai only the second player is human, the host's colour is played by the enemy AI, for dedicated servers
+        self.host_ai = host_ai
+        self.random = rng if rng is not None else random.Random()
+
+        # From config.AI_LOOKAHEAD_LEVEL the enemy AI plans ahead, for up to ai_budget_ms per step() call;
+        # with None every plan finishes in the fixed step that asked for it, which keeps seeded games reproducible
+        self.planner = None
+        self.ai_budget_ms = ai_budget_ms
+        self.next_attack : {(int, int, int): int} = {}
+        if self.enemy_ai and data.level >= config.AI_LOOKAHEAD_LEVEL:
+            from simulation.lookahead_planner import LookaheadPlanner
+            self.planner = LookaheadPlanner(data)
+
+        self.accumulator = 0
+        self.colors : [(int, int, int)] = []
+        # Colours the enemy AI plays, sorted; rebuilt only when a colour enters or leaves the board
+        self.ai_colors : [(int, int, int)] = []
+        self.ai_colors_of : [(int, int, int)] = None
+        self.captured = False
+        self.enemy_ai_done = False
+        self.winner : (int, int, int) = None
+
+    def step(self, dt_ms: int):
+        self.accumulator += dt_ms
+        while self.accumulator >= config.SIMULATION_STEP_MS and self.winner is None:
+            self.accumulator -= config.SIMULATION_STEP_MS
+            self.fixed_step(config.SIMULATION_STEP_MS)
+
+        if self.planner is not None and self.ai_budget_ms is not None and self.winner is None:
+            self.play_planned(self.planner.run(self.ai_budget_ms))
+
+    def fixed_step(self, dt_ms: int):
+        for _ in self.fixed_step_parts(dt_ms):
+            pass
+
+    def fixed_step_parts(self, dt_ms: int):
+        """
+        fixed_step as a generator that pauses after every config.SIMULATION_PART launches, landings or
+        payouts, so a caller short of time can spread a crowded step over several calls. The rules run
+        in the same order either way; nothing else may touch the board until the step is done.
+        """
+        self.data.current_ticks += dt_ms
+        self.colors = self.data.planet_state.present_colors()
+        self.captured = False
+        if self.colors != self.ai_colors_of:
+            self.ai_colors_of = self.colors
+            self.ai_colors = sorted(color for color in self.colors if color != config.NO_OWNER_COLOR and not self.is_player(color))
+
+        if self.replica:
+            # Rockets that reach their target stay there until the host's update removes them
+            self.data.rocket_state.advance(dt_ms)
+            self.check_end_condition()
+            return
+
+        self.update_turn()
+
+        if self.enemy_ai:
+            self.update_enemy_ai()
+
+        yield from self.update_connections()
+        yield from self.update_rockets(dt_ms)
+        yield from self.update_planets()
+
+        self.check_end_condition()
+
+    def is_player(self, color: (int, int, int)) -> bool:
+        if self.all_ai:
+            return False
+        return color == self.data.p2color or (color == self.data.p1color and not self.host_ai)
+
+    # Rules
+
+    def update_turn(self):
+        all_playing_colors = sorted(color for color in self.colors if color != config.NO_OWNER_COLOR)
+        if not all_playing_colors:
+            return
+
+        if self.data.current_ticks - self.data.current_turn_start > config.TURN_TIME or self.data.current_turn_color not in all_playing_colors:
+            idx = all_playing_colors.index(
+                self.data.current_turn_color) + 1 if self.data.current_turn_color in all_playing_colors else 0
+            if idx >= len(all_playing_colors):
+                self.data.year += 1
+
+            self.data.current_turn_color = all_playing_colors[idx % len(all_playing_colors)]
+            self.data.current_turn_start = self.data.current_ticks
+
+            if not self.is_player(self.data.current_turn_color):
+                self.enemy_ai_done = False
+
+    def update_enemy_ai(self):
+        if self.planner is not None:
+            self.update_planned_ai()
+            return
+
+        if not self.is_player(self.data.current_turn_color) and not self.enemy_ai_done:
+            self.run_enemy_ai_turn()
+
+        for color in self.ai_colors:
+            self.run_enemy_ai_continous(color)
+
+    def update_connections(self):
+        current_ticks = self.data.current_ticks
+        timers = self.data.launch_timers
+        # A crowded step pops its due connections a part at a time as well, but launches none before all are out
+        due = []
+        while True:
+            popped = timers.pop_due(current_ticks, config.SIMULATION_PART)
+            due += popped
+            if len(popped) < config.SIMULATION_PART:
+                break
+            yield
+        if not due:
+            return
+
+        state = self.data.planet_state
+        # Due connections launch in creation order, as they appear in data.connections
+        due.sort(key=lambda c: c.id)
+        for part in range(0, len(due), config.SIMULATION_PART):
+            if part:
+                yield
+            launched = []
+            for connection in due[part:part + config.SIMULATION_PART]:
+                source = connection.planet.index
+                cost = state.rocket_upgrade.item(source)
+                if state.value.item(source) > cost:
+                    connection.last_ticks = current_ticks
+                    state.value[source] -= cost
+                    launched.append(connection)
+                    timers.schedule(connection, current_ticks + state.send_rocket_every.item(source) + 1)
+                else:
+                    # Sleeps until the source's value goes up, see wake_launches
+                    self.data.waiting_launches.setdefault(source, []).append(connection)
+
+            if launched:
+                self.data.rocket_state.launch(launched)
+
+    def update_rockets(self, dt_ms: int):
+        rockets = self.data.rocket_state
+        arrived = rockets.advance(dt_ms)
+        if len(arrived) == 0:
+            return
+
+        # Arrivals are resolved in launch order, so captures within one step stay deterministic. A rocket
+        # fights for whoever owns its source planet when it lands
+        planets = self.data.planet_state
+        landings = list(zip(rockets.source[arrived].tolist(), rockets.target[arrived].tolist(), rockets.payload[arrived].tolist()))
+        for part in range(0, len(landings), config.SIMULATION_PART):
+            if part:
+                yield
+            for source, target, payload in landings[part:part + config.SIMULATION_PART]:
+                owner = planets.owner[source]
+                if planets.owner[target] == owner:
+                    planets.value[target] += payload
+                    self.data.wake_launches(self.data.planets[target], self.data.current_ticks + 1)
+                else:
+                    planets.value[target] -= payload
+                    if planets.value[target] <= 0:
+                        self.data.planets[target].set_color(planets.colors[owner])
+                        planets.value[target] = payload
+                        self.data.schedule_income(self.data.planets[target])
+                        self.data.wake_launches(self.data.planets[target], self.data.current_ticks + 1)
+                        self.captured = True
+
+        rockets.release(arrived)
+
+    def update_planets(self):
+        current_ticks = self.data.current_ticks
+        due = self.data.income_timers.pop_due(current_ticks)
+        if not due:
+            return
+        due = np.array(due, dtype=np.int64)
+
+        # Unowned planets sleep until a capture re-arms them
+        paid = self.data.planet_state.apply_income(current_ticks, due)
+        payouts = list(zip(paid.tolist(), self.data.planet_state.add_value_every[paid].tolist()))
+        for part in range(0, len(payouts), config.SIMULATION_PART):
+            if part:
+                yield
+            for index, add_value_every in payouts[part:part + config.SIMULATION_PART]:
+                self.data.income_timers.schedule(index, current_ticks + add_value_every + 1)
+                if index in self.data.waiting_launches:
+                    self.data.wake_launches(self.data.planets[index], current_ticks + 1)
+
+    def check_end_condition(self):
+        all_colors = self.data.planet_state.present_colors() if self.captured else self.colors
+        if len(all_colors) == 1:
+            self.winner = all_colors[0]
+
+    # Enemy AI
+
+    def owned_planets(self, color: (int, int, int)) -> np.ndarray:
+        state = self.data.planet_state
+        return state.tables.owned_by(state.color_id(color))
+
+    def update_planned_ai(self):
+        if not self.is_player(self.data.current_turn_color) and not self.enemy_ai_done:
+            self.planner.request(self.data.current_turn_color, self.planner.TURN)
+            self.enemy_ai_done = True
+
+        for color in self.ai_colors:
+            if self.data.current_ticks >= self.next_attack.get(color, 0):
+                self.planner.request(color, self.planner.ATTACK)
+
+        if self.ai_budget_ms is None:
+            self.play_planned(self.planner.run())
+
+    def play_planned(self, decisions: list):
+        for color, plan, move in decisions:
+            if plan == self.planner.ATTACK:
+                self.next_attack[color] = self.data.current_ticks + config.AI_ATTACK_COOLDOWN_MS
+            elif color != self.data.current_turn_color:
+                # The turn ended while planning
+                continue
+
+            if move is None:
+                continue
+            if self.planner.play(self.data, color, move):
+                logger.info(f"Enemy {color} played {move[0]} on {self.data.planets[move[1]]}"
+                            + (f" to {self.data.planets[move[2]]}" if move[2] is not None else ""))
+            else:
+                logger.debug(f"Enemy {color} dropped {move}, the board changed while planning")
+
+    def run_enemy_ai_turn(self):
+        enemy_planets = self.owned_planets(self.data.current_turn_color)
+        if len(enemy_planets) == 0:
+            self.enemy_ai_done = True
+            return
+
+        # Prioritize upgrading planets with higher values
+        chosen = self.data.planets[enemy_planets[np.argmax(self.data.planet_state.value[enemy_planets])]]
+        if chosen:
+            if chosen.value > config.SATELLITE_COST and chosen.satellite_upgrade < 6:
+                chosen.satellite_upgrade += 1
+                chosen.value -= config.SATELLITE_COST
+                logger.info(
+                    f"Enemy {self.data.current_turn_color} {chosen} upgraded Satellite, new upgrade: {chosen.satellite_upgrade}")
+            elif chosen.value > config.ROCKET_COST and chosen.rocket_upgrade < 4:
+                chosen.rocket_upgrade += 1
+                chosen.value -= config.ROCKET_COST
+                logger.info(
+                    f"Enemy {self.data.current_turn_color} {chosen} upgraded Rocket, new upgrade: {chosen.rocket_upgrade}")
+        self.enemy_ai_done = True
+
+    def run_enemy_ai_continous(self, color: (int, int, int)):
+        # Try to make a new connection to weaker enemy or neutral planets
+        if self.random.random() > 0.005:
+            return
+
+        state = self.data.planet_state
+        enemy_planets = self.owned_planets(color)
+        source = self.data.planets[self.random.choice(enemy_planets)]
+
+        # Prioritize weaker planets (lower value), skipping planets already connected to source in either direction
+        targets = state.tables.targets_of(state.color_id(color))
+        for candidate_index in targets[np.argsort(state.value[targets], kind='stable')].tolist():
+            target = self.data.planets[candidate_index]
+            if not self.data.are_linked(source, target):
+                self.data.add_connection(Connection(source, target))
+                logger.info(f"Enemy connection made between {source} and {target}")
+                return
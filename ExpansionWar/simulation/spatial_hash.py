@@ -0,0 +1,49 @@
+import math
+
+
+class SpatialHash:
+    """
+    Uniform grid over board coordinates. Each item is registered in every cell its bounding box
+    touches, so a query only looks at the items in nearby cells.
+    """
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells : {(int, int): set} = {}
+        self.item_cells = {}
+
+    def cell_range(self, x0: float, y0: float, x1: float, y1: float):
+        for cx in range(math.floor(x0 / self.cell_size), math.floor(x1 / self.cell_size) + 1):
+            for cy in range(math.floor(y0 / self.cell_size), math.floor(y1 / self.cell_size) + 1):
+                yield cx, cy
+
+    def insert(self, item, x0: float, y0: float, x1: float, y1: float):
+        cells = list(self.cell_range(x0, y0, x1, y1))
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(item)
+        self.item_cells[item] = cells
+
+    def copy(self, items: dict) -> 'SpatialHash':
+        """Copy of the grid holding items[item] in place of every item."""
+        copy = SpatialHash(self.cell_size)
+        copy.cells = {cell: {items[item] for item in found} for cell, found in self.cells.items()}
+        copy.item_cells = {items[item]: cells for item, cells in self.item_cells.items()}
+        return copy
+
+    def remove(self, item):
+        for cell in self.item_cells.pop(item, ()):
+            self.cells[cell].discard(item)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def query_point(self, x: float, y: float) -> set:
+        return self.cells.get((math.floor(x / self.cell_size), math.floor(y / self.cell_size)), set())
+
+    def query_box(self, x0: float, y0: float, x1: float, y1: float) -> set:
+        found = set()
+        for cell in self.cell_range(x0, y0, x1, y1):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+    def __len__(self):
+        return len(self.item_cells)
@@ -0,0 +1,124 @@
+import gc
+import random
+import time
+
+import numpy as np
+import pytest
+
+import config
+from data.game_data import GameData
+from entities.connection import Connection
+from entities.planet import Planet
+from simulation.lookahead_planner import LookaheadPlanner
+from simulation.simulation_engine import SimulationEngine
+
+COLORS = [config.NO_OWNER_COLOR, config.PLAYER_COLOR, (200, 60, 60), (60, 60, 200), (200, 200, 60)]
+# How far past its budget a slice may run: one step, which stays well under this even on the large board
+STEP_MS = 2
+
+
+def board(planets: int, connections: int, rockets: int, seed: int = 1) -> GameData:
+    """A board at the planning level with the given counts; as in the benchmarks, planets may overlap."""
+    rng = random.Random(seed)
+    data = GameData(config.PLAYER_COLOR, None, 2100, 2100, config.AI_LOOKAHEAD_LEVEL)
+    for i in range(planets):
+        data.add_planet(Planet(rng.uniform(0, config.GAME_SCENE_WIDTH - config.PLANET_RADIUS * 2),
+                               rng.uniform(0, config.GAME_SCENE_HEIGHT - config.PLANET_RADIUS * 2),
+                               COLORS[i % len(COLORS)]))
+        data.planets[-1].value = rng.randint(1, 200)
+    while len(data.connections) < connections:
+        source, target = rng.sample(data.planets, 2)
+        if not data.are_linked(source, target):
+            data.add_connection(Connection(source, target, warm=False))
+    for _ in range(rockets):
+        rocket = rng.choice(data.connections).launch_rocket()
+        rocket.current_time = rng.uniform(0, rocket.target_time)
+    return data
+
+
+def state_of(data: GameData) -> tuple:
+    """What the rules leave on a board, comparable between a board and its forks."""
+    planets, rockets = data.planet_state, data.rocket_state
+    flying = rockets.in_flight()
+    return (
+        data.current_ticks, data.current_turn_color, data.year,
+        [getattr(planets, name)[:planets.count].tolist() for name in planets.FIELDS],
+        [getattr(rockets, name)[flying].tolist() for name in ('sequence', 'connection', 'source', 'target', 'start', 'duration', 'payload')],
+        sorted((connection.id, due) for connection, due in data.launch_timers.due.items()),
+        sorted(data.income_timers.due.items()),
+        sorted(data.edges),
+    )
+
+
+def play(data: GameData, steps: int, step_ms: int = config.SIMULATION_STEP_MS):
+    engine = SimulationEngine(data, enemy_ai=False)
+    for _ in range(steps):
+        engine.fixed_step(step_ms)
+
+
+def test_restore_matches_a_fresh_fork():
+    data = board(40, 80, 100)
+    fork = data.fork()
+
+    # The fork plays ahead with a connection of its own, while the board drops one and makes another
+    fork.add_connection(Connection(fork.planets[0], fork.planets[7], warm=False))
+    play(fork, 100, config.AI_LOOKAHEAD_STEP_MS)
+    play(data, 50)
+    data.remove_connection(data.connections[3])
+    data.add_connection(Connection(data.planets[1], data.planets[9], warm=False))
+
+    fork.restore(data.snapshot())
+    expected = data.fork()
+    assert state_of(fork) == state_of(expected)
+
+    # Back from a snapshot of its own, as between rollouts
+    start = fork.snapshot()
+    fork.add_connection(Connection(fork.planets[2], fork.planets[5], warm=False))
+    play(fork, 100, config.AI_LOOKAHEAD_STEP_MS)
+    fork.restore(start)
+    assert state_of(fork) == state_of(expected)
+
+    play(fork, 200)
+    play(expected, 200)
+    assert state_of(fork) == state_of(expected)
+
+
+def test_slicing_does_not_change_decisions():
+    decisions = []
+    for budget_ms in (None, 0.05):
+        planner = LookaheadPlanner(board(30, 20, 30))
+        for color in COLORS[1:]:
+            planner.request(color, LookaheadPlanner.ATTACK)
+        planner.request(COLORS[2], LookaheadPlanner.TURN)
+
+        found = []
+        while planner.queue:
+            found += planner.run(budget_ms)
+        decisions.append(found)
+
+    assert any(move is not None for _, _, move in decisions[0])
+    assert decisions[0] == decisions[1]
+
+
+@pytest.mark.parametrize("planets, connections, rockets", [(30, 40, 60), (600, 2000, 3000)])
+def test_slices_stay_within_budget(planets, connections, rockets):
+    data = board(planets, connections, rockets)
+    engine = SimulationEngine(data, enemy_ai=False)
+    planner = LookaheadPlanner(data)
+    for color in COLORS[1:]:
+        planner.request(color, LookaheadPlanner.ATTACK)
+
+    # Slices are timed in CPU time, as on a shared machine wall time also counts whatever else ran. A full
+    # collection on the large board takes longer than any step; it is not the planner's to split
+    gc.disable()
+    try:
+        slices = []
+        while planner.queue and len(slices) < 300:
+            engine.fixed_step(config.SIMULATION_STEP_MS)
+            started = time.thread_time()
+            planner.run(config.AI_FRAME_BUDGET_MS)
+            slices.append((time.thread_time() - started) * 1000)
+    finally:
+        gc.enable()
+
+    assert np.percentile(slices, 99) <= config.AI_FRAME_BUDGET_MS + STEP_MS
@@ -0,0 +1,59 @@
+import math
+import random
+
+import pytest
+
+from pygbagnet.wire_codec import BinaryCodec, JsonCodec
+
+# Every branch of BinaryCodec.write_list and its edges: empty containers, rows and records of width 0,
+# repeated names, numbers outside the array types, and lists that mix types
+CASES = [
+    None, True, False, 0, -1, 2 ** 64, -2 ** 70, 1.5, 3.0, -0.0, math.inf, "", "ü€𝄞", "keyframe",
+    [], [[]], [[], []], [[], [], []], [{}], [{}, {}], [{}, {}, {}], {'planets': [{}, {}]}, {}, {"": ""},
+    [1, 2, 3], [-2 ** 63, 2 ** 63 - 1], [2 ** 63, 1], [1, 2.5], [1.0, 2.0], [True, False, True],
+    [None, None], ["a", "a"], ["a", None, "a"], ["a", "b"], [["x", "y"]] * 4, [[None] * 2] * 3,
+    [[1], [2], [3]], [(1, 2), (3, 4), (5, 6)], [[1, 2], [3, 4]], [[1, 2], [1, 2, 3]], [[[]] * 3] * 3,
+    [{'a': 1, 'b': 2}, {'a': 3, 'b': 4}], [{'a': 1}, {'a': 2}, {'b': 3}], [{'a': 1, 'b': 2}, {'b': 2, 'a': 1}],
+    {'x': [[1.5, 2], [3, 4.5], [5, 6]]}, {'unknown key': [{'owner': None}, {'owner': "x"}]},
+]
+
+
+def as_json(value):
+    """What the JSON codec gives back, which the binary codec must match."""
+    codec = JsonCodec()
+    return codec.decode(codec.encode(value))
+
+
+def same(value, expected) -> bool:
+    """Equal with the same types all the way down, so 1 and 1.0 or True and 1 do not pass for each other."""
+    if type(value) is not type(expected):
+        return False
+    if isinstance(value, list):
+        return len(value) == len(expected) and all(map(same, value, expected))
+    if isinstance(value, dict):
+        return list(value) == list(expected) and all(same(value[key], expected[key]) for key in value)
+    return value == expected
+
+
+@pytest.mark.parametrize("value", CASES, ids=repr)
+def test_round_trip(value):
+    codec = BinaryCodec()
+    assert same(codec.decode(codec.encode(value)), as_json(value))
+
+
+def test_round_trip_compressed_keyframe():
+    rng = random.Random(1)
+    keyframe = {
+        'action': 'keyframe',
+        'version': 7,
+        'colors': [[0, 120, 72], [120, 0, 0], [129, 131, 128]],
+        'planets': [{'x': rng.uniform(0, 800), 'y': rng.uniform(0, 1000), 'radius': 60,
+                     'base_texture_name': rng.choice(["a", "b"]), 'noise_texture_name': None} for _ in range(40)],
+        'fields': {'owner': [rng.randrange(3) for _ in range(40)], 'value': [rng.randrange(-5, 500) for _ in range(40)]},
+        'connections': [[i, rng.randrange(40), rng.randrange(40), rng.randrange(10 ** 6)] for i in range(30)],
+        'rockets': [],
+    }
+    codec = BinaryCodec()
+    text = codec.encode(keyframe)
+    assert same(codec.decode(text), as_json(keyframe))
+    assert len(text) < len(JsonCodec().encode(keyframe))
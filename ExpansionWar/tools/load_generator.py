@@ -0,0 +1,291 @@
+"""
+Loads a relay with simulated players: hosts offer lobbies, clients join them, then every pair exchanges
+card_dropped and connection_created messages. Reports join time, delivery latency and throughput.
+
+Run from the ExpansionWar directory, against a relay of its own:
+    python -m tools.load_generator --pairs 50 --rate 20 --duration 10 --output load.json
+or against one already running, so the relay gets a core to itself:
+    python -m tools.relay_server --port 8765
+    python -m tools.load_generator --relay ://127.0.0.1:8765
+
+With --server it plays the lobbies of a dedicated host (tools.match_server) instead:
+    python -m tools.load_generator --relay ://127.0.0.1:8765 --server host --players 50
+
+Every peer is a real pygbag_net.Node, pumped once per simulated frame like the game does.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+import numpy as np
+
+import config
+from data.state_replicator import StateReplicator
+from pygbagnet.pygbag_net import Node
+from tools.relay_server import RelayServer
+
+logger = logging.getLogger(__name__)
+
+
+class Stats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.latencies_ms : [float] = []
+        self.join_ms : [float] = []
+        self.resyncs = 0
+        self.finished = 0
+
+
+class SimulatedPeer:
+    """One side of a match: a host offering lobby index, or the client that joins it."""
+
+    def __init__(self, index: int, hosting: bool, args, stats: Stats):
+        self.index = index
+        self.hosting = hosting
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(index * 2 + hosting)
+
+        self.node = Node(gid="load")
+        # Nodes made in the same instant would share a nick
+        self.node.nick = f"{'h' if hosting else 'c'}_{index}"
+        self.peer : str = None
+        self.joined = False
+        self.last_offer = 0.0
+        self.join_started = 0.0
+        self.credit = 0.0
+
+    async def run(self, stop: float):
+        frame = 1 / self.args.fps
+        last = time.perf_counter()
+        while time.perf_counter() < stop:
+            for ev in self.node.get_events():
+                self.handle(ev)
+
+            now = time.perf_counter()
+            if self.hosting and self.peer is None and self.node.current_channel and now - self.last_offer > 1:
+                self.last_offer = now
+                self.node.tx({'type': 'offer', 'offer': {'id': self.index, 'lobby_name': self.node.nick,
+                                                         'codecs': self.node.codec_names()}})
+            if self.joined:
+                self.credit += self.args.rate * (now - last)
+                while self.credit >= 1:
+                    self.credit -= 1
+                    self.send_move()
+            last = now
+
+            self.node.flush()
+            await asyncio.sleep(frame)
+
+    def handle(self, ev):
+        if ev != Node.B64JSON:
+            return
+        data = self.node.data
+        if data['type'] == 'offer' and not self.hosting and self.peer is None and data['offer']['id'] == self.index:
+            offer = data['offer']
+            self.peer = offer['lobby_name']
+            self.node.agree(self.peer, offer.get('codecs', ()))
+            self.join_started = time.perf_counter()
+            self.node.privmsg_b64json(self.peer, {'type': 'join', 'nick': self.node.nick, 'codecs': self.node.codec_names()})
+        elif data['type'] == 'join' and self.hosting and self.peer is None:
+            self.peer = data['nick']
+            self.node.agree(self.peer, data.get('codecs', ()))
+            self.joined = True
+            self.node.privmsg_encoded(self.peer, {'type': 'message', 'message': {'action': 'welcome'}})
+        elif data['type'] == 'message':
+            message = data['message']
+            if message['action'] == 'welcome':
+                self.joined = True
+                self.stats.join_ms.append((time.perf_counter() - self.join_started) * 1000)
+            else:
+                self.stats.received += 1
+                self.stats.latencies_ms.append((time.perf_counter() - message['sent']) * 1000)
+
+    def send_move(self):
+        if self.rng.random() < 0.5:
+            message = {'action': 'card_dropped', 'planet_index': self.rng.randrange(60), 'card': self.rng.randrange(2)}
+        else:
+            message = {'action': 'connection_created', 'source_index': self.rng.randrange(60), 'target_index': self.rng.randrange(60)}
+        message |= {'request': not self.hosting, 'sent': time.perf_counter()}
+        self.node.privmsg_encoded(self.peer, {'type': 'message', 'message': message})
+        self.stats.sent += 1
+
+
+class MatchClient:
+    """
+    A player of a dedicated host: joins one of its lobbies, keeps a replica of the board from the keyframe
+    and deltas like the game's client, acknowledges versions, plays random moves at the rate, and joins
+    another lobby when the match ends.
+    """
+
+    def __init__(self, index: int, args, stats: Stats):
+        self.index = index
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(index)
+
+        self.node = Node(gid=args.gid)
+        self.node.nick = f"p_{index}"
+        self.joined = False
+        self.join_started : float = None
+        self.replicator : StateReplicator = None
+        self.data = None
+        self.resync_from = None
+        self.last_ack = 0.0
+        self.credit = 0.0
+
+    async def run(self, stop: float):
+        frame = 1 / self.args.fps
+        last = time.perf_counter()
+        while time.perf_counter() < stop:
+            for ev in self.node.get_events():
+                self.handle(ev)
+
+            now = time.perf_counter()
+            if self.data is not None:
+                if self.replicator.version > self.replicator.acknowledged and (now - self.last_ack) * 1000 >= config.REPLICATION_ACK_MS:
+                    self.last_ack = now
+                    self.replicator.acknowledged = self.replicator.version
+                    self.send({'action': 'state_ack', 'version': self.replicator.version})
+                self.credit += self.args.rate * (now - last)
+                while self.credit >= 1:
+                    self.credit -= 1
+                    self.send_move()
+            last = now
+
+            self.node.flush()
+            await asyncio.sleep(frame)
+
+    def handle(self, ev):
+        if ev != Node.B64JSON:
+            return
+        data = self.node.data
+        now = time.perf_counter()
+        if data['type'] == 'offer' and data['offer']['lobby_name'] == self.args.server and self.data is None:
+            # A join that got no keyframe, the lobby went to someone else, is tried again on a later offer
+            if self.join_started is None or now - self.join_started > 3:
+                offer = data['offer']
+                self.join_started = now
+                self.replicator = StateReplicator()
+                self.node.agree(self.args.server, offer.get('codecs', ()))
+                self.node.privmsg_b64json(self.args.server, {'type': 'join', 'nick': self.node.nick, 'id': offer['id'],
+                                                             'codecs': self.node.codec_names()})
+        elif data['type'] == 'message' and self.node.sender == self.args.server and self.replicator is not None:
+            message = data['message']
+            if message['action'] == 'keyframe':
+                if self.data is None:
+                    self.joined = True
+                    self.stats.join_ms.append((now - self.join_started) * 1000)
+                self.data = self.replicator.apply_keyframe(message, self.data)
+                self.stats.received += 1
+            elif message['action'] == 'delta' and self.data is not None:
+                self.stats.received += 1
+                if not self.replicator.apply_delta(self.data, message):
+                    if self.resync_from != self.replicator.version:
+                        self.resync_from = self.replicator.version
+                        self.stats.resyncs += 1
+                        self.send({'action': 'state_ack', 'version': self.replicator.version, 'resync': True})
+                elif len(self.data.planet_state.present_colors()) == 1:
+                    self.stats.finished += 1
+                    self.data = self.replicator = self.join_started = None
+
+    def send(self, message: dict):
+        self.node.privmsg_encoded(self.args.server, {'type': 'message', 'message': message | {'request': True}})
+
+    def send_move(self):
+        planets = len(self.data.planets)
+        if self.rng.random() < 0.5:
+            self.send({'action': 'card_dropped', 'planet_index': self.rng.randrange(planets), 'card': self.rng.randrange(2)})
+        else:
+            source, target = self.rng.sample(range(planets), 2)
+            self.send({'action': 'connection_created', 'source_index': source, 'target_index': target})
+        self.stats.sent += 1
+
+
+def percentiles(values: [float]) -> dict:
+    if not values:
+        return {}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'p50': p50, 'p90': p90, 'p99': p99, 'max': max(values), 'count': len(values)}
+
+
+async def generate(args) -> dict:
+    relay = None
+    if args.relay is None:
+        relay = await RelayServer(args.ping_interval).start("127.0.0.1", args.port)
+        Node.host = f"://127.0.0.1:{args.port}"
+    else:
+        Node.host = args.relay
+
+    stats = Stats()
+    if args.server is None:
+        peers = [SimulatedPeer(i, hosting, args, stats) for i in range(args.pairs) for hosting in (True, False)]
+    else:
+        peers = [MatchClient(i, args, stats) for i in range(args.players)]
+    started = time.perf_counter()
+    stop = started + args.duration
+    await asyncio.gather(*(peer.run(stop) for peer in peers))
+    elapsed = time.perf_counter() - started
+
+    report = {
+        'pairs': args.pairs if args.server is None else args.players,
+        'joined': sum(peer.joined for peer in peers) // (2 if args.server is None else 1),
+        'sent': stats.sent,
+        'received': stats.received,
+        'messages_per_s': stats.received / elapsed,
+        'join_ms': percentiles(stats.join_ms),
+        'latency_ms': percentiles(stats.latencies_ms),
+        'resyncs': stats.resyncs,
+        'finished': stats.finished,
+    }
+    if relay is not None:
+        report['relay_routed_per_s'] = relay.routed / elapsed
+        report['relay_bytes_per_s'] = relay.routed_bytes / elapsed
+        await relay.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a relay with simulated hosts and clients")
+    parser.add_argument("--pairs", type=int, default=20, help="host and client pairs")
+    parser.add_argument("--rate", type=float, default=10, help="messages per second each peer sends once joined")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--fps", type=float, default=60, help="frames per second each peer is pumped at")
+    parser.add_argument("--relay", default=None, help="relay to load, as Node.host; a local one is started if not given")
+    parser.add_argument("--port", type=int, default=8765, help="port of the local relay")
+    parser.add_argument("--ping-interval", type=float, default=30)
+    parser.add_argument("--server", default=None, help="nick of a dedicated host to play instead of pairing peers")
+    parser.add_argument("--players", type=int, default=20, help="players joining the dedicated host")
+    parser.add_argument("--gid", default="PlanetConqueror", help="game id of the dedicated host")
+    parser.add_argument("--output", default=None, help="JSON file to write the report to")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("websockets").setLevel(logging.WARNING)
+
+    report = asyncio.run(generate(args))
+    latency = report['latency_ms']
+    if args.server is None:
+        logger.info(f"{report['joined']}/{report['pairs']} pairs joined, {report['received']}/{report['sent']} messages "
+                    f"delivered, {report['messages_per_s']:.0f}/s")
+    else:
+        logger.info(f"{report['joined']}/{report['pairs']} players joined, {report['sent']} moves sent, {report['received']} "
+                    f"state messages received, {report['messages_per_s']:.0f}/s, {report['resyncs']} resyncs, "
+                    f"{report['finished']} matches finished")
+    if latency:
+        logger.info(f"latency p50 {latency['p50']:.1f} ms, p90 {latency['p90']:.1f} ms, p99 {latency['p99']:.1f} ms, "
+                    f"max {latency['max']:.1f} ms")
+    if report['join_ms']:
+        logger.info(f"join p50 {report['join_ms']['p50']:.1f} ms, p99 {report['join_ms']['p99']:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
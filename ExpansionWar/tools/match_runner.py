@@ -0,0 +1,118 @@
+"""
+Plays seeded AI-vs-AI matches without a display, spread over a process pool, and writes the results
+as columns to a compressed .npz file.
+
+Run from the ExpansionWar directory:
+    python -m tools.match_runner --matches 1000 --level 3 --output matches.npz
+"""
+import argparse
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+import config
+from data.game_data import GameData
+from managers.game_manager import GameManager
+from simulation.simulation_engine import SimulationEngine
+
+logger = logging.getLogger(__name__)
+
+
+def play_match(seed: int, level: int, enemy_ct: int, enemy_planets: int, sample_every: int, max_duration: int) -> dict:
+    """Plays one match; the seed fixes both the board and every AI decision."""
+    manager = GameManager()
+    data = GameData(config.PLAYER_COLOR, None, 2100, 2100, level)
+    manager.data = data
+    manager.generate_planets(enemy_ct, enemy_planets, seed)
+
+    # Colors are random per match, so they are reported as slots in generation order: 0 is unowned, 1 the player
+    slots = {}
+    for planet in data.planets:
+        slots.setdefault(planet.color, len(slots))
+
+    engine = SimulationEngine(data, rng=random.Random(seed), all_ai=True, ai_budget_ms=None)
+
+    samples = []
+    started = time.perf_counter()
+    while engine.winner is None and data.current_ticks < max_duration:
+        engine.step(sample_every)
+        owners = data.planet_state.owners()
+        for color, count in zip(*np.unique(owners, return_counts=True)):
+            samples.append((data.current_ticks, slots[data.planet_state.colors[color]], int(count)))
+
+    return {
+        'seed': seed,
+        'planets': len(data.planets),
+        'colors': len(slots),
+        'winner': slots[engine.winner] if engine.winner is not None else -1,
+        'years': data.year - data.year_start,
+        'duration': data.current_ticks,
+        'wall_time': time.perf_counter() - started,
+        'samples': samples,
+    }
+
+
+def run_batch(args: tuple) -> [dict]:
+    seeds, level, enemy_ct, enemy_planets, sample_every, max_duration = args
+    return [play_match(seed, level, enemy_ct, enemy_planets, sample_every, max_duration) for seed in seeds]
+
+
+def to_columns(results: [dict]) -> dict:
+    columns = {
+        name: np.array([result[name] for result in results], dtype=dtype)
+        for name, dtype in (('seed', np.int64), ('planets', np.int32), ('colors', np.int32), ('winner', np.int32),
+                            ('years', np.int32), ('duration', np.int64), ('wall_time', np.float64))
+    }
+
+    # Ownership samples are one long table, sample_match being the row of the match in the columns above
+    columns['sample_match'] = np.array([i for i, result in enumerate(results) for _ in result['samples']], dtype=np.int32)
+    for column, name, dtype in ((0, 'sample_ticks', np.int64), (1, 'sample_slot', np.int16), (2, 'sample_planets', np.int32)):
+        columns[name] = np.array([sample[column] for result in results for sample in result['samples']], dtype=dtype)
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play seeded headless AI-vs-AI matches in parallel")
+    parser.add_argument("--matches", type=int, default=100)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--enemy-ct", type=int, default=None, help="enemy colors, the level formula if not given")
+    parser.add_argument("--enemy-planets", type=int, default=None, help="planets per color, the level formula if not given")
+    parser.add_argument("--sample-every", type=int, default=1000, help="ownership sample period in game ms")
+    parser.add_argument("--max-duration", type=int, default=30 * 60 * 1000, help="game ms before a match is a draw")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch", type=int, default=8, help="matches sent to a worker at once")
+    parser.add_argument("--output", default="matches.npz")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # The game logs every AI move, far too much for thousands of matches
+    for name in ("simulation.simulation_engine", "managers.game_manager"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    seeds = list(range(args.first_seed, args.first_seed + args.matches))
+    batches = [(seeds[i:i + args.batch], args.level, args.enemy_ct, args.enemy_planets, args.sample_every, args.max_duration)
+               for i in range(0, len(seeds), args.batch)]
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for batch in pool.map(run_batch, batches):
+            results.extend(batch)
+            logger.info(f"{len(results)}/{len(seeds)} matches done")
+
+    np.savez_compressed(args.output, **to_columns(results))
+
+    winners = np.array([result['winner'] for result in results])
+    logger.info(f"{len(results)} matches in {time.perf_counter() - started:.1f}s on {args.workers} workers, "
+                f"player slot won {np.mean(winners == 1):.1%}, draws {np.mean(winners == -1):.1%}, written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
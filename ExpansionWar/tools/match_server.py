@@ -0,0 +1,228 @@
+"""
+Dedicated host: runs many matches in one asyncio loop without a window, all behind one network node,
+and reports how many matches a core sustains.
+
+Each match is a GameManager of its own in HOST mode whose seat is played by the enemy AI, so a player
+joining one of its lobbies from the game plays the AI with the server keeping the authoritative state.
+Incoming messages are routed to a match by the nick that sent them.
+
+Run from the ExpansionWar directory:
+    python -m tools.relay_server --port 8765
+    python -m tools.match_server --relay ://127.0.0.1:8765 --nick host --lobbies 8
+and load it with simulated players from another process:
+    python -m tools.load_generator --relay ://127.0.0.1:8765 --server host --players 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+import config
+from managers.game_manager import GameManager, GameMode
+from managers.pygbagnet_manager import PygbagnetManager
+from pygbagnet.pygbag_net import Node
+from simulation.simulation_engine import SimulationEngine
+
+logger = logging.getLogger(__name__)
+
+
+class MatchServer(PygbagnetManager):
+    """Keeps open lobbies offered, seats the players joining them and steps every match once per frame."""
+
+    def __init__(self, node, lobbies: int = 4, capacity: int = None, idle_timeout: float = 60, report_every: float = 10):
+        super().__init__(node)
+        self.lobbies = lobbies
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.report_every = report_every
+
+        self.matches : {str: GameManager} = {}
+        self.players : {str: GameManager} = {}
+        self.heard : {str: float} = {}
+
+        self.finished = 0
+        self.dropped = 0
+        self.reports : [dict] = []
+        self.frame_ms : [float] = []
+        self.step_s = 0.0
+        self.last_report = (time.perf_counter(), time.process_time())
+
+    @staticmethod
+    def clock() -> int:
+        return int(time.perf_counter() * 1000)
+
+    async def serve(self, duration: float = None):
+        stop = None if duration is None else time.perf_counter() + duration
+        last = self.clock()
+        while stop is None or time.perf_counter() < stop:
+            await self.tick()
+
+            now = self.clock()
+            dt, last = now - last, now
+            self.open_lobbies()
+            for match in list(self.matches.values()):
+                self.step(match, now, dt)
+            self.flush()
+
+            self.frame_ms.append(time.perf_counter() * 1000 - now)
+            if time.perf_counter() - self.last_report[0] >= self.report_every:
+                self.report()
+            await asyncio.sleep(max(0, config.SIMULATION_STEP_MS - (self.clock() - now)) / 1000)
+
+    def open_lobbies(self):
+        waiting = sum(match.conn is None for match in self.matches.values())
+        while waiting < self.lobbies and (self.capacity is None or len(self.matches) < self.capacity):
+            match = GameManager()
+            match.game_mode = GameMode.HOST
+            match.host_game()
+            match.engine = SimulationEngine(match.data, host_ai=True)
+            self.matches[match.lobby_id] = match
+            waiting += 1
+
+    def step(self, match: GameManager, now: int, dt: int):
+        if match.conn is None:
+            if now - match.offer_last_tick > 1000:
+                match.offer_last_tick = now
+                self.offer_lobby(match.lobby_id)
+            return
+
+        if time.perf_counter() - self.heard[match.conn] > self.idle_timeout:
+            logger.info(f"{match.conn} went quiet, closing its match")
+            self.dropped += 1
+            self.close(match)
+            return
+
+        started = time.perf_counter()
+        match.engine.step(dt)
+        match.replicate()
+        self.step_s += time.perf_counter() - started
+
+        if match.engine.winner is not None:
+            # The client sees the end in the last delta, whenever the interval would have sent it
+            message = match.replicator.delta(match.data)
+            if message is not None:
+                match.send_network_message(message)
+            logger.info(f"Match of {match.conn} won by {'the player' if match.engine.winner == match.data.p2color else 'the host'}")
+            self.finished += 1
+            self.close(match)
+
+    def close(self, match: GameManager):
+        del self.matches[match.lobby_id]
+        if self.players.get(match.conn) is match:
+            del self.players[match.conn]
+            del self.heard[match.conn]
+
+    def seat(self, data: dict):
+        """Gives a joining player the lobby it asked for, or any open one; a repeated join gets its keyframe again."""
+        nick = data['nick']
+        match = self.players.get(nick)
+        if match is None:
+            match = self.matches.get(data.get('id'))
+            if match is None or match.conn is not None:
+                self.open_lobbies()
+                match = next((match for match in self.matches.values() if match.conn is None), None)
+            if match is None:
+                logger.warning(f"No open lobby for {nick}")
+                return
+            match.conn = nick
+            self.players[nick] = match
+            logger.info(f"{nick} joined lobby {match.lobby_id}")
+
+        self.node.agree(nick, data.get('codecs', ()))
+        self.heard[nick] = time.perf_counter()
+        match.send_full_data()
+
+    def report(self):
+        """Logs the load since the last report: matches playing, the core they took and how many would fill it."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        busy = (cpu - self.last_report[1]) / (wall - self.last_report[0])
+        playing = len(self.players)
+        frames = np.array(self.frame_ms) if self.frame_ms else np.zeros(1)
+        report = {
+            'playing': playing,
+            'open': len(self.matches) - playing,
+            'finished': self.finished,
+            'dropped': self.dropped,
+            'cpu': busy,
+            'matches_per_core': playing / busy if playing and busy else None,
+            'step_ms_per_match_frame': self.step_s * 1000 / max(1, playing * len(self.frame_ms)),
+            'frame_p50_ms': float(np.percentile(frames, 50)),
+            'frame_p99_ms': float(np.percentile(frames, 99)),
+        }
+        self.reports.append(report)
+        self.frame_ms.clear()
+        self.step_s = 0.0
+        self.last_report = (wall, cpu)
+
+        estimate = f", ~{report['matches_per_core']:.0f} matches per core" if report['matches_per_core'] else ""
+        logger.info(f"{playing} playing, {report['open']} open, {self.finished} finished, cpu {busy:.0%}{estimate}, "
+                    f"frame p50 {report['frame_p50_ms']:.1f} ms p99 {report['frame_p99_ms']:.1f} ms")
+
+    # ------------------- event handlers for the matches -------------------- #
+
+    async def _on_reconnected(self, _) -> None:
+        # Clients notice the gap from the next delta and ask for a resync themselves
+        logger.info("RECONNECTED as %s", self.node.nick)
+
+    async def _on_b64json(self, ev) -> None:
+        data = self.node.data
+
+        if data['type'] == "join":
+            self.seat(data)
+        elif data['type'] == "message":
+            match = self.players.get(self.node.sender)
+            if match is None:
+                return
+            self.heard[self.node.sender] = time.perf_counter()
+            match.process_network_message(data['message'])
+
+
+async def run(args) -> [dict]:
+    if args.relay is not None:
+        Node.host = args.relay
+    node = Node(gid=args.gid)
+    if args.nick is not None:
+        node.nick = args.nick
+    config.pgnm = MatchServer(node, args.lobbies, args.capacity, args.idle_timeout, args.report_every)
+    await config.pgnm.serve(args.duration)
+    return config.pgnm.reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many matches without a window, over one network node")
+    parser.add_argument("--relay", default=None, help="relay to use, as Node.host; config.RELAY_HOST if not given")
+    parser.add_argument("--gid", default="PlanetConqueror", help="game id, whose lobby channel the offers go to")
+    parser.add_argument("--nick", default=None, help="nick to offer lobbies under, a random one if not given")
+    parser.add_argument("--lobbies", type=int, default=4, help="open lobbies kept offered")
+    parser.add_argument("--capacity", type=int, default=None, help="most matches at once, open lobbies included")
+    parser.add_argument("--idle-timeout", type=float, default=60, help="seconds without a message before a match is closed")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to run, until interrupted if not given")
+    parser.add_argument("--report-every", type=float, default=10, help="seconds between load reports")
+    parser.add_argument("--output", default=None, help="JSON file to write the load reports to")
+    args = parser.parse_args()
+    if args.relay is None:
+        args.relay = config.RELAY_HOST
+
+    logging.basicConfig(level=logging.INFO)
+    # Every move and message is logged by the game, far too much for many matches
+    for name in ("websockets", "simulation.simulation_engine", "managers.game_manager", "managers.pygbagnet_manager"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    try:
+        reports = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        reports = config.pgnm.reports if config.pgnm is not None else []
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Stand-in for the public relay: a websocket server speaking the part of IRC that pygbag_net.Node uses,
+so multiplayer can be played and load tested offline.
+
+Run from the ExpansionWar directory:
+    python -m tools.relay_server --port 8765
+
+and point the game at it with RELAY_HOST = "://127.0.0.1:8765" in config.py.
+"""
+import argparse
+import asyncio
+import logging
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+
+class Peer:
+    """A connected websocket. Lines for it are gathered and sent as one frame per loop turn, in order."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.nick : str = None
+        self.channels : {str} = set()
+        self.outq : asyncio.Queue = asyncio.Queue()
+        self.writer = asyncio.create_task(self.write_frames())
+
+    def write(self, line: str):
+        self.outq.put_nowait(line)
+
+    async def write_frames(self):
+        while True:
+            lines = [await self.outq.get()]
+            while not self.outq.empty():
+                lines.append(self.outq.get_nowait())
+            try:
+                await self.websocket.send("".join(f"{line}\r\n" for line in lines))
+            except websockets.ConnectionClosed:
+                return
+
+
+class RelayServer:
+    """
+    NICK, USER, JOIN, PART, PRIVMSG to a nick or a channel, and PING / PONG both ways. Joining a channel
+    answers with the JOIN to every member, then 353 and 366 with the member list. Anything else is
+    ignored.
+    """
+
+    NAME = "relay"
+
+    def __init__(self, ping_interval: float = 30):
+        self.ping_interval = ping_interval
+        self.peers : {str: Peer} = {}
+        self.channels : {str: {str}} = {}
+        self.server = None
+
+        self.routed = 0
+        self.routed_bytes = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> 'RelayServer':
+        self.server = await websockets.serve(self.handle, host, port, max_size=None)
+        logger.info(f"Relay listening on ws://{host}:{port}")
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, websocket):
+        peer = Peer(websocket)
+        pinger = asyncio.create_task(self.ping(peer))
+        buffer = bytearray()
+        try:
+            async for frame in websocket:
+                buffer += frame.encode() if isinstance(frame, str) else frame
+                end = buffer.rfind(b"\n")
+                if end < 0:
+                    continue
+                lines = buffer[:end].decode("utf-8").split("\n")
+                del buffer[:end + 1]
+                for line in lines:
+                    if line.strip():
+                        self.command(peer, line.rstrip("\r"))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            pinger.cancel()
+            peer.writer.cancel()
+            self.leave(peer)
+
+    async def ping(self, peer: Peer):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            peer.write(f"PING :{RelayServer.NAME}")
+
+    def command(self, peer: Peer, line: str):
+        verb, _, rest = line.partition(" ")
+        verb = verb.upper()
+        if verb == "NICK":
+            self.nick(peer, rest.strip().lstrip(":"))
+        elif verb == "JOIN":
+            for channel in rest.strip().lstrip(":").split(","):
+                self.join(peer, channel)
+        elif verb == "PART":
+            channel = rest.split(" ")[0]
+            self.part(peer, channel)
+        elif verb == "PRIVMSG":
+            target, _, text = rest.partition(" :")
+            self.privmsg(peer, target.strip(), text)
+        elif verb == "PING":
+            peer.write(f":{RelayServer.NAME} PONG {RelayServer.NAME} :{rest.lstrip(':')}")
+
+    def nick(self, peer: Peer, nick: str):
+        owner = self.peers.get(nick)
+        if owner is not None and owner is not peer:
+            peer.write(f":{RelayServer.NAME} 433 * {nick} :Nickname is already in use")
+            return
+        welcome = peer.nick is None
+        if peer.nick is not None:
+            del self.peers[peer.nick]
+        peer.nick = nick
+        self.peers[nick] = peer
+        if welcome:
+            peer.write(f":{RelayServer.NAME} 001 {nick} :Welcome to the local relay {nick}")
+
+    def join(self, peer: Peer, channel: str):
+        if peer.nick is None or not channel.startswith("#"):
+            return
+        members = self.channels.setdefault(channel, set())
+        members.add(peer.nick)
+        peer.channels.add(channel)
+        for member in members:
+            self.peers[member].write(f":{peer.nick}!{peer.nick}@{RelayServer.NAME} JOIN {channel}")
+        peer.write(f":{RelayServer.NAME} 353 {peer.nick} = {channel} :{' '.join(sorted(members))}")
+        peer.write(f":{RelayServer.NAME} 366 {peer.nick} {channel} :End of /NAMES list.")
+
+    def part(self, peer: Peer, channel: str):
+        members = self.channels.get(channel, set())
+        members.discard(peer.nick)
+        peer.channels.discard(channel)
+        if not members:
+            self.channels.pop(channel, None)
+
+    def leave(self, peer: Peer):
+        for channel in list(peer.channels):
+            self.part(peer, channel)
+        if peer.nick is not None and self.peers.get(peer.nick) is peer:
+            del self.peers[peer.nick]
+
+    def privmsg(self, peer: Peer, target: str, text: str):
+        if peer.nick is None:
+            return
+        line = f":{peer.nick}!{peer.nick}@{RelayServer.NAME} PRIVMSG {target} :{text}"
+        if target.startswith("#"):
+            recipients = [self.peers[member] for member in self.channels.get(target, ()) if member != peer.nick]
+        elif target in self.peers:
+            recipients = [self.peers[target]]
+        else:
+            peer.write(f":{RelayServer.NAME} 401 {peer.nick} {target} :No such nick/channel")
+            return
+        for recipient in recipients:
+            recipient.write(line)
+        self.routed += len(recipients)
+        self.routed_bytes += len(line) * len(recipients)
+
+
+async def serve(args):
+    relay = await RelayServer(args.ping_interval).start(args.host, args.port)
+    try:
+        await asyncio.Future()
+    finally:
+        await relay.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the multiplayer relay")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ping-interval", type=float, default=30, help="seconds between keepalive PINGs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("websockets").setLevel(logging.WARNING)
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()